@@ -1,12 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
+import plotly.io as pio
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import yagmail
 from datetime import datetime, timedelta
-from streamlit_autorefresh import st_autorefresh
 import logging
 import re
+import bisect
+import hashlib
+import json
+import io
+import asyncio
+import time
+import os
+import tempfile
+import uuid
+import threading
+import functools
+import sys
+import shutil
+import weakref
+from collections import Counter, OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
 from fuzzywuzzy import process, fuzz
+from predicates import combine_predicates, compile_predicate, parse_predicate, predicate_leaves
+from sketches import SketchIndex, sketch_aggregate
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -63,61 +87,1027 @@ yag = yagmail.SMTP(user="akhilmiriyala998@gmail.com", password="vqollmbkelbybdut
 st.title("Employee Performance Dashboard")
 st.markdown("Interactive visualizations of employee performance metrics.")
 
+# Sessions only ever read the shared frame; copy-on-write keeps any column they derive from touching it
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # Load data from Google Sheets
-try:
-    sheet_url = "https://docs.google.com/spreadsheets/d/1OxU_4C8zAp_3sqcmj2dnn4YB7N6xcI6PUPLWSG-yl4E/export?format=csv"
-    df = pd.read_csv(sheet_url)
-    logger.info("Successfully loaded data from Google Sheet.")
-except Exception as e:
-    st.error(f"Failed to load data from Google Sheet: {str(e)}")
-    logger.error(f"Data loading error: {str(e)}")
-    df = pd.DataFrame()
-
-# Preprocessing
-if not df.empty:
-    try:
-        df['Hire_Date'] = pd.to_datetime(df['Hire_Date'], errors='coerce')
-        df['Years_At_Company'] = (pd.Timestamp.now() - df['Hire_Date']).dt.days / 365.25
-        df['Performance_Level'] = pd.cut(df['Performance_Score'], 
-                                        bins=[-float('inf'), 1.67, 3.33, float('inf')], 
-                                        labels=['Low', 'Medium', 'High'], include_lowest=True)
-        df['Satisfaction_Level'] = pd.cut(df['Employee_Satisfaction_Score'], 
-                                         bins=[-float('inf'), 1.67, 3.33, float('inf')], 
-                                         labels=['Low', 'Medium', 'High'], include_lowest=True)
-        df['Retention_Risk_Level'] = pd.cut(df['Retension risk index'], 
-                                           bins=[-float('inf'), 0.67, 1.33, float('inf')], 
-                                           labels=['Low', 'Medium', 'High'], include_lowest=True)
-        df['Remote_Work_Category'] = df['Remote_Work_Frequency'].apply(
-            lambda x: 'Work From Office' if x == 0 else 'Work From Home' if x == 100 else 'Hybrid'
+sheet_url = "https://docs.google.com/spreadsheets/d/1OxU_4C8zAp_3sqcmj2dnn4YB7N6xcI6PUPLWSG-yl4E/export?format=csv"
+
+# Score columns bucketed into Low/Medium/High levels, with the cut points between the buckets
+LEVEL_LABELS = ['Low', 'Medium', 'High']
+LEVEL_BUCKETS = {
+    'Performance_Level': ('Performance_Score', (1.67, 3.33)),
+    'Satisfaction_Level': ('Employee_Satisfaction_Score', (1.67, 3.33)),
+    'Retention_Risk_Level': ('Retension risk index', (0.67, 1.33))
+}
+
+def preprocess_employee_data(df):
+    df['Hire_Date'] = pd.to_datetime(df['Hire_Date'], errors='coerce')
+    df['Years_At_Company'] = (pd.Timestamp.now() - df['Hire_Date']).dt.days / 365.25
+    for level_col, (score_col, thresholds) in LEVEL_BUCKETS.items():
+        df[level_col] = pd.cut(df[score_col], bins=[-float('inf'), *thresholds, float('inf')],
+                               labels=LEVEL_LABELS, include_lowest=True)
+    df['Remote_Work_Category'] = df['Remote_Work_Frequency'].apply(
+        lambda x: 'Work From Office' if x == 0 else 'Work From Home' if x == 100 else 'Hybrid'
+    )
+    if 'Annual Salary' in df.columns:
+        df['Annual Salary'] = df['Annual Salary'].replace('[\$,]', '', regex=True).astype(float)
+        logger.info(f"Annual Salary data type: {df['Annual Salary'].dtype}")
+    else:
+        logger.warning("Annual Salary column not found.")
+    if 'Number_of_Projects' not in df.columns:
+        logger.warning("Number_of_Projects column not found.")
+    if 'Overtime_Hours' not in df.columns:
+        logger.warning("Overtime_Hours column not found.")
+    logger.info("Preprocessing completed successfully.")
+    return df
+
+# --- Multi-Source Ingestion ---
+# Every business unit exports its own sheet/CSV. Sources are fetched concurrently over one pooled
+# aiohttp session with a per-source timeout, parsed in a worker pool and unioned with a Source column.
+# EMPLOYEE_DATA_SOURCES overrides the defaults as "Name=url,Name=url" (e.g. local HTTP stand-ins).
+DATA_SOURCES = {"Main": sheet_url}
+if os.environ.get("EMPLOYEE_DATA_SOURCES"):
+    DATA_SOURCES = dict(item.split("=", 1) for item in os.environ["EMPLOYEE_DATA_SOURCES"].split(","))
+SOURCE_TIMEOUT_SECONDS = 30
+HTTP_POOL_LIMIT = 10
+PARSE_WORKERS = 4
+
+async def fetch_source(session, name, url, timeout):
+    start = time.perf_counter()
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        response.raise_for_status()
+        body = await response.read()
+    return body, (time.perf_counter() - start) * 1000
+
+async def fetch_sources(sources, timeout):
+    connector = aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(
+            *(fetch_source(session, name, url, timeout) for name, url in sources.items()),
+            return_exceptions=True
         )
-        if 'Annual Salary' in df.columns:
-            df['Annual Salary'] = df['Annual Salary'].replace('[\$,]', '', regex=True).astype(float)
-            logger.info(f"Annual Salary data type: {df['Annual Salary'].dtype}")
+    return dict(zip(sources, results))
+
+def parse_source(name, body):
+    start = time.perf_counter()
+    df = pd.read_csv(io.BytesIO(body))
+    df['Source'] = name
+    return df, (time.perf_counter() - start) * 1000
+
+def ingest_sources(sources, timeout=SOURCE_TIMEOUT_SECONDS):
+    report = []
+    fetched = asyncio.run(fetch_sources(sources, timeout))
+    bodies = {}
+    for name, result in fetched.items():
+        if isinstance(result, Exception):
+            error = "timed out" if isinstance(result, asyncio.TimeoutError) else str(result)
+            logger.error(f"Fetch error for source {name}: {error}")
+            report.append({'Source': name, 'Fetch ms': None, 'Parse ms': None, 'Rows': 0, 'Error': error})
         else:
-            logger.warning("Annual Salary column not found.")
-        if 'Number_of_Projects' not in df.columns:
-            logger.warning("Number_of_Projects column not found.")
-        if 'Overtime_Hours' not in df.columns:
-            logger.warning("Overtime_Hours column not found.")
-        logger.info("Preprocessing completed successfully.")
+            bodies[name] = result
+    frames = []
+    # The C CSV parser releases the GIL, so a thread pool parses sources in parallel without pickling frames
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        futures = {name: pool.submit(parse_source, name, body) for name, (body, _) in bodies.items()}
+        for name, future in futures.items():
+            fetch_ms = bodies[name][1]
+            try:
+                frame, parse_ms = future.result()
+                frames.append(frame)
+                report.append({'Source': name, 'Fetch ms': round(fetch_ms, 1), 'Parse ms': round(parse_ms, 1), 'Rows': len(frame), 'Error': None})
+            except Exception as e:
+                logger.error(f"Parse error for source {name}: {str(e)}")
+                report.append({'Source': name, 'Fetch ms': round(fetch_ms, 1), 'Parse ms': None, 'Rows': 0, 'Error': str(e)})
+    for entry in report:
+        logger.info(f"Source {entry['Source']}: fetch {entry['Fetch ms']} ms, parse {entry['Parse ms']} ms, {entry['Rows']} rows.")
+    # Union under a common schema: columns missing from a source are filled with NaN
+    df = pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame()
+    return df, report
+
+def load_employee_data(sources=DATA_SOURCES):
+    try:
+        df, report = ingest_sources(sources)
+        if df.empty:
+            errors = "; ".join(f"{entry['Source']}: {entry['Error']}" for entry in report if entry['Error'])
+            raise ValueError(errors or "no rows returned")
+        logger.info("Successfully loaded data from Google Sheet.")
+    except Exception as e:
+        logger.error(f"Data loading error: {str(e)}")
+        return pd.DataFrame(), f"Failed to load data from Google Sheet: {str(e)}", []
+    try:
+        df = preprocess_employee_data(df)
     except Exception as e:
-        st.error(f"Error during preprocessing: {str(e)}")
         logger.error(f"Preprocessing error: {str(e)}")
+        return df, f"Error during preprocessing: {str(e)}", report
+    # A missing business unit is reported as an error so the refresher keeps the previous complete version
+    # and partial data never reaches the snapshot or the history
+    failed = [f"{entry['Source']}: {entry['Error']}" for entry in report if entry['Error']]
+    if failed:
+        return df, f"Partial data, some sources failed to load ({'; '.join(failed)})", report
+    return df, None, report
+
+def compute_data_version(df):
+    if df.empty:
+        return "empty"
+    # Years_At_Company is derived from the current time, so it is left out of the content hash
+    content = df.drop(columns=['Years_At_Company'], errors='ignore')
+    return hashlib.sha1(pd.util.hash_pandas_object(content, index=True).values.tobytes()).hexdigest()[:16]
+
+# --- Shared Dataset ---
+# One read-only, versioned frame per process shared by every browser session.
+# Publishing a new version swaps a single reference, so readers always see a complete dataset.
+class Dataset:
+    def __init__(self, df, error=None, ingest_report=None, version=None, source="live"):
+        self.df = df
+        self.error = error
+        self.ingest_report = ingest_report or []
+        self.version = version or compute_data_version(df)
+        self.memory_bytes = int(df.memory_usage(deep=True).sum())
+        self.source = source
+        self.loaded_at = datetime.now()
+
+# --- Snapshot Store ---
+# The preprocessed frame is persisted as a versioned Feather file and memory-mapped on startup,
+# so a cold process renders immediately (and offline) while the live sheet is fetched in the background.
+SNAPSHOT_DIR = os.environ.get("EMPLOYEE_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+SNAPSHOTS_TO_KEEP = 2
+
+class SnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.pointer_path = os.path.join(directory, "CURRENT")
+
+    def save(self, dataset):
+        if dataset.df.empty or dataset.error:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            filename = f"employees-{dataset.version}.feather"
+            path = os.path.join(self.directory, filename)
+            if not os.path.exists(path):
+                tmp_path = f"{path}.tmp"
+                feather.write_feather(dataset.df.reset_index(drop=True), tmp_path, compression="uncompressed")
+                os.replace(tmp_path, path)
+            tmp_pointer = f"{self.pointer_path}.tmp"
+            with open(tmp_pointer, "w") as f:
+                f.write(filename)
+            os.replace(tmp_pointer, self.pointer_path)
+            self._prune(filename)
+            logger.info(f"Saved snapshot {filename}.")
+        except Exception as e:
+            logger.error(f"Snapshot save error: {str(e)}")
+
+    def load(self):
+        try:
+            with open(self.pointer_path) as f:
+                filename = f.read().strip()
+        except OSError:
+            return None
+        try:
+            start = time.perf_counter()
+            # Uncompressed Feather maps straight from the page cache instead of being read and decoded
+            table = feather.read_table(os.path.join(self.directory, filename), memory_map=True)
+            df = table.to_pandas()
+            df['Years_At_Company'] = (pd.Timestamp.now() - df['Hire_Date']).dt.days / 365.25
+            version = filename[len("employees-"):-len(".feather")]
+            logger.info(f"Loaded snapshot {filename} ({len(df)} rows) in {(time.perf_counter() - start) * 1000:.1f} ms.")
+            return Dataset(df, version=version, source="snapshot")
+        except Exception as e:
+            logger.error(f"Snapshot load error: {str(e)}")
+            return None
+
+    def _prune(self, current_filename):
+        snapshots = sorted(
+            (name for name in os.listdir(self.directory) if name.startswith("employees-") and name.endswith(".feather")),
+            key=lambda name: os.path.getmtime(os.path.join(self.directory, name)),
+            reverse=True
+        )
+        for name in snapshots[SNAPSHOTS_TO_KEEP:]:
+            if name != current_filename:
+                os.remove(os.path.join(self.directory, name))
+
+# --- Snapshot History ---
+# Append-only history of published versions. Only per-employee deltas (changed/new rows plus deleted keys)
+# are stored between refreshes; every HISTORY_COMPACT_EVERY deltas a full base is written so that any
+# version can be rebuilt from the nearest base plus a short chain of deltas.
+HISTORY_KEY = 'Employee_ID'
+HISTORY_COMPACT_EVERY = 12
+HISTORY_CACHE_SIZE = 4
+
+class SnapshotHistory:
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.entries = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _write_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _content(df):
+        return df.drop(columns=['Years_At_Company'], errors='ignore').reset_index(drop=True)
+
+    @staticmethod
+    def _row_hashes(content):
+        return pd.Series(pd.util.hash_pandas_object(content, index=False).values, index=content[HISTORY_KEY])
+
+    def versions(self):
+        return [(entry['version'], entry['created_at']) for entry in self.entries]
+
+    def append(self, dataset, previous=None):
+        if dataset.df.empty or dataset.error or HISTORY_KEY not in dataset.df.columns:
+            return
+        with self.lock:
+            if self.entries and self.entries[-1]['version'] == dataset.version:
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                content = self._content(dataset.df)
+                deltas_since_base = 0
+                for entry in reversed(self.entries):
+                    if entry['kind'] == 'base':
+                        break
+                    deltas_since_base += 1
+                previous_content = self._content(previous.df) if previous is not None else None
+                # A delta is only valid against the same schema; a renamed column or a dtype change
+                # (e.g. one blank cell turning an int column into float) starts a new base
+                can_diff = (
+                    previous is not None and self.entries and self.entries[-1]['version'] == previous.version
+                    and content[HISTORY_KEY].is_unique and previous.df[HISTORY_KEY].is_unique
+                    and list(previous_content.columns) == list(content.columns)
+                    and previous_content.dtypes.equals(content.dtypes)
+                )
+                if can_diff and deltas_since_base < HISTORY_COMPACT_EVERY:
+                    kind, frame = 'delta', self._diff(previous_content, content)
+                else:
+                    kind, frame = 'base', content
+                filename = f"{kind}-{dataset.version}.feather"
+                tmp_path = os.path.join(self.directory, f"{filename}.tmp")
+                feather.write_feather(frame, tmp_path)
+                os.replace(tmp_path, os.path.join(self.directory, filename))
+                self.entries.append({
+                    'version': dataset.version,
+                    'kind': kind,
+                    'file': filename,
+                    'created_at': dataset.loaded_at.isoformat(timespec='seconds'),
+                    'rows': len(frame)
+                })
+                self._write_manifest()
+                logger.info(f"Recorded history {kind} for version {dataset.version} ({len(frame)} rows).")
+            except Exception as e:
+                logger.error(f"History append error: {str(e)}")
+
+    def _diff(self, old, new):
+        old_hashes = self._row_hashes(old)
+        new_hashes = self._row_hashes(new)
+        aligned = old_hashes.reindex(new_hashes.index)
+        changed = new[(aligned.values != new_hashes.values) | aligned.isna().values].copy()
+        changed['_deleted'] = False
+        # Deleted rows carry their last values rather than NaN so the delta keeps the frame's exact dtypes
+        removed = old[~old[HISTORY_KEY].isin(new[HISTORY_KEY])].copy()
+        removed['_deleted'] = True
+        return pd.concat([changed, removed], ignore_index=True)
+
+    @staticmethod
+    def _apply_delta(frame, delta):
+        deleted = delta['_deleted'].to_numpy(dtype=bool)
+        # Upserts keep the delta's own dtypes, which are the dtypes of the version it records
+        upserts = delta[~deleted].drop(columns=['_deleted'])
+        drop_keys = set(delta.loc[deleted, HISTORY_KEY]) | set(upserts[HISTORY_KEY])
+        kept = frame[~frame[HISTORY_KEY].isin(drop_keys)]
+        return pd.concat([kept, upserts[frame.columns]], ignore_index=True)
+
+    def _iter_frames(self, start_index, end_index):
+        # Walks back to the nearest base at or before start_index, then rolls deltas forward to end_index
+        base_index = start_index
+        while self.entries[base_index]['kind'] != 'base':
+            base_index -= 1
+        frame = None
+        for index in range(base_index, end_index + 1):
+            entry = self.entries[index]
+            path = os.path.join(self.directory, entry['file'])
+            part = feather.read_table(path, memory_map=True).to_pandas()
+            frame = part if entry['kind'] == 'base' else self._apply_delta(frame, part)
+            if index >= start_index:
+                yield entry, frame
+
+    def reconstruct(self, version):
+        with self.lock:
+            if version in self.cache:
+                self.cache.move_to_end(version)
+                return self.cache[version]
+            index = next((i for i, entry in enumerate(self.entries) if entry['version'] == version), None)
+            if index is None:
+                return None
+            _, frame = list(self._iter_frames(index, index))[-1]
+            frame = frame.copy()
+            frame['Years_At_Company'] = (pd.Timestamp.now() - frame['Hire_Date']).dt.days / 365.25
+            self.cache[version] = frame
+            while len(self.cache) > HISTORY_CACHE_SIZE:
+                self.cache.popitem(last=False)
+            return frame
+
+    def aggregate(self, compute, since=None):
+        # Applies compute(frame) -> scalar to every version in one forward pass over the delta chain
+        with self.lock:
+            if not self.entries:
+                return pd.DataFrame(columns=['Snapshot', 'Value'])
+            start_index = 0
+            if since is not None:
+                start_index = next((i for i, entry in enumerate(self.entries) if entry['created_at'] >= since), len(self.entries) - 1)
+            rows = []
+            for entry, frame in self._iter_frames(start_index, len(self.entries) - 1):
+                rows.append({'Snapshot': pd.to_datetime(entry['created_at']), 'Value': compute(frame)})
+            return pd.DataFrame(rows)
+
+class DatasetStore:
+    def __init__(self, loader, snapshots=None, history=None):
+        self.loader = loader
+        self.snapshots = snapshots
+        self.history = history
+        self.lock = threading.Lock()
+        self.current = None
+        # Bumped on every eviction so a refresh that started before it cannot bring the dataset back
+        self.generation = 0
+
+    def get(self):
+        dataset = self.current
+        if dataset is None:
+            with self.lock:
+                if self.current is None:
+                    self.current = self._load_initial()
+                dataset = self.current
+        return dataset
+
+    def _load_initial(self):
+        if self.snapshots:
+            dataset = self.snapshots.load()
+            if dataset is not None:
+                return dataset
+        start = time.perf_counter()
+        dataset = Dataset(*self.loader())
+        logger.info(f"Loaded live data ({len(dataset.df)} rows) in {(time.perf_counter() - start) * 1000:.1f} ms.")
+        if self.snapshots:
+            self.snapshots.save(dataset)
+        if self.history:
+            self.history.append(dataset)
+        return dataset
+
+    def clear(self):
+        with self.lock:
+            self.current = None
+            self.generation += 1
+
+    def publish(self, dataset, generation=None):
+        with self.lock:
+            if generation is not None and (generation != self.generation or self.current is None):
+                logger.info(f"Dataset version {dataset.version} not published: the tenant was evicted while it loaded.")
+                return None
+            previous, self.current = self.current, dataset
+        logger.info(f"Published dataset version {dataset.version} ({len(dataset.df)} rows).")
+        if self.snapshots:
+            self.snapshots.save(dataset)
+        if self.history:
+            self.history.append(dataset, previous)
+        return dataset
+
+# --- Background Refresh ---
+# A single thread per process polls the sources of every resident tenant and publishes a new version only
+# when its content changed; open sessions poll the cheap version number and rerun only when what they display is stale.
+REFRESH_INTERVAL_SECONDS = 5 * 60
+VERSION_CHECK_SECONDS = 30
+
+class DatasetRefresher:
+    def __init__(self, registry, interval):
+        self.registry = registry
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="dataset-refresher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def schedule(self, entry, delay=0):
+        entry.next_refresh_at = time.time() + delay
+        self.wake_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            now = time.time()
+            due_times = []
+            for entry in self.registry.resident_entries():
+                if entry.next_refresh_at is None:
+                    entry.next_refresh_at = now + self.interval
+                if entry.next_refresh_at <= now:
+                    try:
+                        self.refresh(entry.store)
+                    except Exception as e:
+                        logger.error(f"Background refresh error for tenant {entry.tenant_id}: {str(e)}")
+                    entry.next_refresh_at = now + self.interval
+                due_times.append(entry.next_refresh_at)
+            self.wake_event.wait(max(0, min(due_times) - time.time()) if due_times else self.interval)
+            self.wake_event.clear()
+
+    def refresh(self, store):
+        generation = store.generation
+        df, error, report = store.loader()
+        if error:
+            logger.warning(f"Background refresh skipped: {error}")
+            return False
+        dataset = Dataset(df, ingest_report=report)
+        current = store.current
+        if current is not None and dataset.version == current.version:
+            logger.info("Background refresh found no changes.")
+            return False
+        return store.publish(dataset, generation) is not None
+
+# --- Figure Cache ---
+# Built figures are stored as plotly JSON keyed by (data version, sidebar filters, chart id),
+# so reruns that don't change the data or the filters skip the groupby and figure construction.
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class FigureCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= len(self.entries.pop(key))
+            self.entries[key] = value
+            self.current_bytes += size
+            # Evict least recently used figures until we are back under the memory budget
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+# --- Tenant Registry ---
+# Each client organization (tenant) has its own sources, dataset store, snapshots, history, figure cache
+# and per-version indexes. All tenants share one memory budget: when it is exceeded, the least recently
+# used idle tenants are evicted and reloaded lazily (from their snapshot) on next access.
+# EMPLOYEE_TENANTS overrides the defaults as JSON: {"tenant": {"Source": "url", ...}, ...}. A session's tenant comes
+# from deployment config, never from the URL: EMPLOYEE_TENANT pins a deployment to one tenant, otherwise the signed-in
+# user's email (or its "@domain") is looked up in EMPLOYEE_TENANT_USERS, JSON {"user@org.com": "tenant", "@org.com": "tenant"}.
+# Only emails listed in EMPLOYEE_TENANT_ADMINS (comma separated) see the stats of every tenant.
+TENANTS = {"default": DATA_SOURCES}
+if os.environ.get("EMPLOYEE_TENANTS"):
+    TENANTS = json.loads(os.environ["EMPLOYEE_TENANTS"])
+DEFAULT_TENANT = next(iter(TENANTS))
+DEPLOYMENT_TENANT = os.environ.get("EMPLOYEE_TENANT")
+TENANT_USERS = json.loads(os.environ.get("EMPLOYEE_TENANT_USERS", "{}"))
+TENANT_ADMINS = {email.strip().lower() for email in os.environ.get("EMPLOYEE_TENANT_ADMINS", "").split(",") if email.strip()}
+TENANT_MEMORY_BUDGET_BYTES = 1024 * 1024 * 1024
+
+def estimate_bytes(root):
+    # Deep size of a derived index: frames and arrays report their buffers, containers and plain objects are walked.
+    # Shared objects are counted once.
+    seen = set()
+    total = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, pd.DataFrame):
+            total += int(obj.memory_usage(index=True, deep=True).sum())
+        elif isinstance(obj, (pd.Series, pd.Index)):
+            total += int(obj.memory_usage(deep=True))
+        elif isinstance(obj, np.ndarray):
+            total += obj.nbytes
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+        else:
+            total += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+                # Strings are leaves; sizing them in bulk keeps large vocabularies cheap to measure
+                strings = [item for item in obj if type(item) is str]
+                total += sum(map(sys.getsizeof, strings))
+                if len(strings) < len(obj):
+                    stack.extend(item for item in obj if type(item) is not str)
+            elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+                stack.append(vars(obj))
+    return total
+
+class TenantEntry:
+    def __init__(self, tenant_id, sources):
+        tenant_dir = os.path.join(SNAPSHOT_DIR, tenant_id)
+        self.tenant_id = tenant_id
+        self.store = DatasetStore(
+            functools.partial(load_employee_data, sources),
+            SnapshotStore(tenant_dir),
+            SnapshotHistory(os.path.join(tenant_dir, "history"))
+        )
+        self.figure_cache = FigureCache(FIGURE_CACHE_MAX_BYTES)
+        self.indexes = {}
+        self.index_bytes = {}
+        self.last_access = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.next_refresh_at = None
+
+    @property
+    def resident(self):
+        return self.store.current is not None
+
+    def cached(self, name, version, build):
+        # Indexes derived from the data are built once per dataset version; stale versions are dropped.
+        # build receives the previous version's index of the same name (or None) so it can reuse unchanged parts.
+        key = (name, version)
+        value = self.indexes.get(key)
+        if value is None:
+            previous = next((v for (n, _), v in self.indexes.items() if n == name), None)
+            value = build(previous)
+            indexes = {k: v for k, v in self.indexes.items() if k[1] == version}
+            indexes[key] = value
+            index_bytes = {k: v for k, v in self.index_bytes.items() if k in indexes}
+            index_bytes[key] = estimate_bytes(value)
+            self.indexes, self.index_bytes = indexes, index_bytes
+        return value
+
+    def memory_bytes(self):
+        dataset = self.store.current
+        return ((dataset.memory_bytes if dataset is not None else 0) + self.figure_cache.current_bytes
+                + sum(self.index_bytes.values()))
+
+    def evict(self):
+        self.store.clear()
+        self.figure_cache.clear()
+        self.indexes = {}
+        self.index_bytes = {}
+        self.next_refresh_at = None
+
+class TenantRegistry:
+    def __init__(self, tenants, memory_budget):
+        self.tenants = tenants
+        self.memory_budget = memory_budget
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.refresher = DatasetRefresher(self, REFRESH_INTERVAL_SECONDS)
+
+    def get(self, tenant_id):
+        with self.lock:
+            entry = self.entries.get(tenant_id)
+            if entry is None:
+                entry = self.entries[tenant_id] = TenantEntry(tenant_id, self.tenants[tenant_id])
+            if entry.resident:
+                entry.hits += 1
+            else:
+                entry.misses += 1
+            entry.last_access = time.time()
+        dataset = entry.store.get()
+        if entry.next_refresh_at is None:
+            # A tenant that came up from its snapshot fetches its live sources right away
+            self.refresher.schedule(entry, 0 if dataset.source == "snapshot" else REFRESH_INTERVAL_SECONDS)
+        self.enforce_budget(keep=tenant_id)
+        return entry
+
+    def resident_entries(self):
+        with self.lock:
+            return [entry for entry in self.entries.values() if entry.resident]
+
+    def enforce_budget(self, keep=None):
+        with self.lock:
+            total = sum(entry.memory_bytes() for entry in self.entries.values())
+            idle = sorted((entry for entry in self.entries.values() if entry.resident and entry.tenant_id != keep),
+                          key=lambda entry: entry.last_access)
+            for entry in idle:
+                if total <= self.memory_budget:
+                    break
+                freed = entry.memory_bytes()
+                entry.evict()
+                total -= freed
+                logger.info(f"Evicted tenant {entry.tenant_id} ({freed / 1024 / 1024:.1f} MB) to stay under the memory budget.")
+
+    def stats(self):
+        with self.lock:
+            entries = list(self.entries.values())
+        rows = []
+        for entry in entries:
+            requests = entry.hits + entry.misses
+            figure_requests = entry.figure_cache.hits + entry.figure_cache.misses
+            rows.append({
+                'Tenant': entry.tenant_id,
+                'Resident': entry.resident,
+                'Memory MB': round(entry.memory_bytes() / 1024 / 1024, 2),
+                'Dataset Hit Rate': round(entry.hits / requests, 3) if requests else None,
+                'Figure Hit Rate': round(entry.figure_cache.hits / figure_requests, 3) if figure_requests else None,
+                'Requests': requests
+            })
+        return pd.DataFrame(rows)
+
+def resolve_tenant(email):
+    # Returns the tenant this viewer may see, or None when they can't be mapped to one
+    if DEPLOYMENT_TENANT:
+        return DEPLOYMENT_TENANT if DEPLOYMENT_TENANT in TENANTS else None
+    if email:
+        email = email.lower()
+        tenant_id = TENANT_USERS.get(email) or TENANT_USERS.get(email[email.find('@'):])
+        return tenant_id if tenant_id in TENANTS else None
+    # Without sign-in only a single-tenant deployment is unambiguous
+    return DEFAULT_TENANT if len(TENANTS) == 1 else None
+
+@st.cache_resource
+def get_tenant_registry():
+    registry = TenantRegistry(TENANTS, TENANT_MEMORY_BUDGET_BYTES)
+    registry.refresher.start()
+    return registry
+
+tenant_registry = get_tenant_registry()
+user_email = st.user.get("email") if st.user.get("is_logged_in") else None
+is_tenant_admin = bool(user_email) and user_email.lower() in TENANT_ADMINS
+tenant_id = resolve_tenant(user_email)
+if tenant_id is None:
+    if user_email:
+        st.error(f"{user_email} is not assigned to an organization. Ask an administrator for access.")
+    else:
+        st.info("Sign in to see your organization's dashboard.")
+        st.button("Sign in", on_click=st.login)
+    st.stop()
+tenant = tenant_registry.get(tenant_id)
+dataset = tenant.store.get()
+df = dataset.df
+data_version = dataset.version
+if dataset.error:
+    st.error(dataset.error)
+figure_cache = tenant.figure_cache
+
+# --- Alert Views ---
+# The alert sets are materialized once per data version together with position indexes by Department,
+# Job_Title and both, so the email handler, the view buttons and the Data Alerts tables all read the same
+# precomputed frames with a dictionary lookup instead of rescanning the employee frame.
+ALERT_COLUMNS = ['Employee_ID', 'Department', 'Job_Title']
+ALERT_DEFINITIONS = {
+    'low_satisfaction': ('Satisfaction_Level', 'Low', 'Low Satisfaction'),
+    'low_performance': ('Performance_Level', 'Low', 'Low Performance'),
+    'high_retention': ('Retention_Risk_Level', 'High', 'High Retention Risk')
+}
+
+class AlertViews:
+    def __init__(self, df):
+        self.frames = {}
+        self.indexes = {}
+        self.email_sections = {}
+        for name, (col, level, label) in ALERT_DEFINITIONS.items():
+            if df.empty or col not in df.columns:
+                frame = pd.DataFrame(columns=ALERT_COLUMNS)
+            else:
+                frame = df.loc[df[col] == level, ALERT_COLUMNS].reset_index(drop=True)
+            index = {}
+            if not frame.empty:
+                for (dept, job), positions in frame.groupby(['Department', 'Job_Title'], observed=True).indices.items():
+                    index[(dept, job)] = positions
+                for dept, positions in frame.groupby('Department', observed=True).indices.items():
+                    index[(dept, None)] = positions
+                for job, positions in frame.groupby('Job_Title', observed=True).indices.items():
+                    index[(None, job)] = positions
+            self.frames[name] = frame
+            self.indexes[name] = index
+            lines = (f"{label} - EmpID: " + frame['Employee_ID'].astype(str) + ", Dept: " + frame['Department'].astype(str)
+                     + ", Job: " + frame['Job_Title'].astype(str))
+            self.email_sections[name] = "\n".join(lines) if not frame.empty else "None"
+
+    def view(self, name, department="All", job_title="All"):
+        frame = self.frames[name]
+        if department == "All" and job_title == "All":
+            return frame
+        key = (None if department == "All" else department, None if job_title == "All" else job_title)
+        positions = self.indexes[name].get(key)
+        return frame.iloc[positions] if positions is not None else frame.iloc[0:0]
+
+    def has_alerts(self):
+        return any(not frame.empty for frame in self.frames.values())
+
+    def email_content(self):
+        return (f"Employee Alerts:\n\nLow Satisfaction Alerts:\n{self.email_sections['low_satisfaction']}"
+                f"\n\nLow Performance Alerts:\n{self.email_sections['low_performance']}"
+                f"\n\nHigh Retention Risk Alerts:\n{self.email_sections['high_retention']}")
+
+# --- Session State Storage ---
+# Chat history is a ring buffer and result frames live in a per-session store with a memory budget;
+# frames that don't fit are spilled to Parquet on local disk and referenced by id. Each session spills into
+# its own directory, removed when the session's store is garbage collected; directories left behind by a
+# crashed process are pruned by age when new sessions start. Spilled frames are written in row groups so a
+# result page is read from the groups that cover it instead of loading the whole file.
+CHAT_HISTORY_MAX_MESSAGES = 200
+CHAT_PAGE_SIZE = 20
+RESULT_MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+RESULT_MAX_STORED = 20
+RESULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "employee_dashboard_results")
+RESULT_CACHE_MAX_AGE_SECONDS = 24 * 3600
+RESULT_SPILL_ROW_GROUP_ROWS = 10_000
+CONTEXT_TURNS = 3
+CONTEXT_IGNORED_WORDS = frozenset(['employee', 'emp', 'id', 'more', 'details', 'further'])
+EMPLOYEE_MENTION_PATTERN = re.compile(r'(?:employee|emp\s*id|employee\s*id)\s*(\d+)')
+
+class ChatHistory:
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+
+    def append(self, message):
+        self.messages.append(message)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def recent(self, n):
+        return list(islice(self.messages, max(0, len(self.messages) - n), None))
+
+    def page(self, page_index, page_size):
+        # Page 0 is the most recent page
+        end = max(0, len(self.messages) - page_index * page_size)
+        return list(islice(self.messages, max(0, end - page_size), end))
+
+class SpilledResult:
+    def __init__(self, path):
+        self.path = path
+        self.metadata = pq.read_metadata(path)
+        self.columns = self.metadata.schema.to_arrow_schema().names
+
+    def __len__(self):
+        return self.metadata.num_rows
+
+    def slice(self, start, stop):
+        groups, offset, first = [], 0, None
+        for i in range(self.metadata.num_row_groups):
+            rows = self.metadata.row_group(i).num_rows
+            if offset < stop and offset + rows > start:
+                groups.append(i)
+                first = offset if first is None else first
+            offset += rows
+        if not groups:
+            return pd.read_parquet(self.path).iloc[0:0]
+        frame = pq.ParquetFile(self.path).read_row_groups(groups).to_pandas()
+        return frame.iloc[start - first:stop - first].reset_index(drop=True)
+
+    def row_groups(self):
+        parquet_file = pq.ParquetFile(self.path)
+        for i in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(i).to_pandas()
+
+    def to_frame(self):
+        return pd.read_parquet(self.path)
+
+class ResultStore:
+    def __init__(self, memory_budget, max_results):
+        self.memory_budget = memory_budget
+        self.max_results = max_results
+        self.in_memory = OrderedDict()
+        self.spilled = OrderedDict()
+        self.memory_bytes = 0
+        self.directory = os.path.join(RESULT_CACHE_DIR, uuid.uuid4().hex)
+        weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def put(self, result_df):
+        result_id = uuid.uuid4().hex
+        size = int(result_df.memory_usage(deep=True).sum())
+        if size > self.memory_budget:
+            self._spill(result_id, result_df)
+        else:
+            self.in_memory[result_id] = (result_df, size)
+            self.memory_bytes += size
+            while self.memory_bytes > self.memory_budget:
+                old_id, (old_df, old_size) = self.in_memory.popitem(last=False)
+                self.memory_bytes -= old_size
+                self._spill(old_id, old_df)
+        while len(self.in_memory) + len(self.spilled) > self.max_results:
+            if self.spilled:
+                _, path = self.spilled.popitem(last=False)
+                self._remove(path)
+            else:
+                _, (_, old_size) = self.in_memory.popitem(last=False)
+                self.memory_bytes -= old_size
+        return result_id
+
+    def get(self, result_id):
+        result = self.view(result_id)
+        return result.to_frame() if isinstance(result, SpilledResult) else result
+
+    def view(self, result_id):
+        # The frame itself when it is in memory, otherwise a SpilledResult that reads pages from disk
+        if result_id is None:
+            return None
+        if result_id in self.in_memory:
+            return self.in_memory[result_id][0]
+        path = self.spilled.get(result_id)
+        if path is None:
+            return None
+        try:
+            return SpilledResult(path)
+        except Exception as e:
+            logger.error(f"Failed to read spilled result {result_id}: {str(e)}")
+            return None
+
+    def _spill(self, result_id, result_df):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{result_id}.parquet")
+            result_df.to_parquet(path, index=False, row_group_size=RESULT_SPILL_ROW_GROUP_ROWS)
+            self.spilled[result_id] = path
+            logger.info(f"Spilled result {result_id} ({len(result_df)} rows) to disk.")
+        except Exception as e:
+            logger.error(f"Failed to spill result {result_id}: {str(e)}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def prune_result_cache(max_age_seconds):
+    cutoff = time.time() - max_age_seconds
+    try:
+        entries = list(os.scandir(RESULT_CACHE_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+            logger.info(f"Pruned stale result cache entry {entry.name}.")
+        except OSError:
+            pass
+
+# Conversation context is updated once per user turn: a window of the last few turns' keywords with a
+# running keyword count, the employee mentioned most recently, and the last query plan and result id,
+# so follow-up and same-topic checks never rescan the chat history
+class ConversationContext:
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.keywords = Counter()
+        self.last_employee_id = None
+        self.last_query_info = None
+        self.last_result_id = None
+        self.last_result_version = None
+
+    def __bool__(self):
+        return bool(self.turns)
+
+    def observe(self, message):
+        if len(self.turns) == self.turns.maxlen:
+            expired, _ = self.turns[0]
+            self.keywords.subtract(expired)
+            for word in expired:
+                if self.keywords[word] <= 0:
+                    del self.keywords[word]
+        words = set(message.split()) - CONTEXT_IGNORED_WORDS
+        mention = EMPLOYEE_MENTION_PATTERN.search(message)
+        self.turns.append((words, mention.group(1) if mention else None))
+        self.keywords.update(words)
+
+    def related(self, message):
+        return any(word in self.keywords for word in message.split())
+
+    def mentioned_employee(self):
+        return next((employee_id for _, employee_id in reversed(self.turns) if employee_id), None)
+
+def set_last_result(result_df, query_info):
+    context = st.session_state.conversation_context
+    context.last_result_id = st.session_state.result_store.put(result_df)
+    context.last_query_info = query_info
+    context.last_result_version = data_version
+
+def get_last_result():
+    return st.session_state.result_store.get(st.session_state.conversation_context.last_result_id)
+
+def expand_last_result(result_df, columns):
+    # Adds columns to a cached result by looking its Employee_IDs up in the shared frame, instead of re-running the query
+    index = tenant.cached('employee_positions', data_version, lambda previous: pd.Index(df['Employee_ID']))
+    if st.session_state.conversation_context.last_result_version != data_version or not index.is_unique:
+        return None
+    positions = index.get_indexer(result_df['Employee_ID'])
+    if (positions < 0).any():
+        return None
+    added = [col for col in columns if col not in result_df.columns]
+    return pd.concat([result_df.reset_index(drop=True), df[added].iloc[positions].reset_index(drop=True)], axis=1)
+
+# --- Result Pagination and Export ---
+# Result tables only serialize the visible page to the browser. Exports are produced on demand when the
+# download button is clicked, encoding the frame in fixed-size row chunks into an in-memory buffer. Streamlit
+# keeps the finished file in its media store as bytes while it is served, so one encoded copy of an export
+# is held in memory for the download; the chunking only bounds the encoder's working set on top of that.
+# A spilled result is paged and exported from its Parquet file, one row group at a time.
+RESULT_PAGE_SIZE = 100
+EXPORT_CHUNK_ROWS = 50_000
+
+def export_result(result, fmt):
+    started = time.perf_counter()
+    if isinstance(result, SpilledResult):
+        if fmt == 'parquet':
+            with open(result.path, 'rb') as handle:
+                data = handle.read()
+            logger.info(f"Exported {len(result)} rows as {fmt} ({len(data)} bytes) in {(time.perf_counter() - started) * 1000:.1f} ms.")
+            return data
+        chunks = result.row_groups()
+    else:
+        chunks = (result.iloc[start:start + EXPORT_CHUNK_ROWS] for start in range(0, max(len(result), 1), EXPORT_CHUNK_ROWS))
+    buffer = io.BytesIO()
+    if fmt == 'csv':
+        for i, chunk in enumerate(chunks):
+            buffer.write(chunk.to_csv(index=False, header=i == 0).encode('utf-8'))
+    else:
+        schema = pa.Schema.from_pandas(result, preserve_index=False)
+        with pq.ParquetWriter(buffer, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    data = buffer.getvalue()
+    logger.info(f"Exported {len(result)} rows as {fmt} ({len(data)} bytes) in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    return data
+
+def render_paginated(result, key, **kwargs):
+    # result is a DataFrame or a SpilledResult; only the visible page is materialized
+    total = len(result)
+    page_count = max(1, -(-total // RESULT_PAGE_SIZE))
+    page = 1
+    if page_count > 1:
+        page_key = f"{key}_page"
+        if st.session_state.get(page_key, 1) > page_count:
+            st.session_state[page_key] = page_count
+        page = int(st.number_input("Result page", min_value=1, max_value=page_count, key=page_key))
+    start = (page - 1) * RESULT_PAGE_SIZE
+    if isinstance(result, SpilledResult):
+        st.dataframe(result.slice(start, start + RESULT_PAGE_SIZE), **kwargs)
+    else:
+        st.dataframe(result.iloc[start:start + RESULT_PAGE_SIZE], **kwargs)
+    if total:
+        st.caption(f"Rows {start + 1}-{min(start + RESULT_PAGE_SIZE, total)} of {total}")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download CSV", functools.partial(export_result, result, 'csv'),
+                               file_name=f"{key}.csv", mime="text/csv", key=f"{key}_csv", on_click="ignore")
+        with col2:
+            st.download_button("Download Parquet", functools.partial(export_result, result, 'parquet'),
+                               file_name=f"{key}.parquet", mime="application/octet-stream", key=f"{key}_parquet", on_click="ignore")
 
 # --- Chatbot Setup ---
 # Initialize session state
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = ChatHistory(CHAT_HISTORY_MAX_MESSAGES)
+if 'result_store' not in st.session_state:
+    prune_result_cache(RESULT_CACHE_MAX_AGE_SECONDS)
+    st.session_state.result_store = ResultStore(RESULT_MEMORY_BUDGET_BYTES, RESULT_MAX_STORED)
 if 'visualization_choice' not in st.session_state:
     st.session_state.visualization_choice = None
 if 'last_query' not in st.session_state:
     st.session_state.last_query = None
-if 'last_result_df' not in st.session_state:
-    st.session_state.last_result_df = None
-if 'last_query_info' not in st.session_state:
-    st.session_state.last_query_info = None
-if 'last_employee_id' not in st.session_state:
-    st.session_state.last_employee_id = None
+if 'conversation_context' not in st.session_state:
+    st.session_state.conversation_context = ConversationContext(CONTEXT_TURNS)
+if 'chat_turn' not in st.session_state:
+    # The last answered chat input and how its stored result is shown; reruns with the same input, data version
+    # and sidebar selection reuse it
+    st.session_state.chat_turn = None
 
 # Intent definitions
 intents = [
@@ -208,35 +1198,52 @@ intents = [
 ]
 
 # Chatbot functions
+# Column synonyms shared by the query parser and the chat typeahead
+COLUMN_KEYWORDS = {
+    'department': 'Department', 'dept': 'Department', 'departments': 'Department',
+    'job title': 'Job_Title', 'job titles': 'Job_Title', 'jobtitle': 'Job_Title', 'jobtitles': 'Job_Title',
+    'gender': 'Gender', 'work mode': 'Remote_Work_Category', 'remote work': 'Remote_Work_Category', 'remote': 'Remote_Work_Category',
+    'salary': 'Annual Salary', 'pay': 'Annual Salary', 'wage': 'Annual Salary',
+    'performance': 'Performance_Score', 'performance score': 'Performance_Score', 'performance index': 'Performance_Score',
+    'satisfaction': 'Employee_Satisfaction_Score', 'satisfaction score': 'Employee_Satisfaction_Score',
+    'productivity': 'Productivity score', 'retention': 'Retension risk index', 'retention risk': 'Retension risk index',
+    'age': 'Age', 'hire date': 'Hire_Date', 'years at company': 'Years_At_Company',
+    'male': 'Gender', 'males': 'Gender', 'female': 'Gender', 'females': 'Gender',
+    'employee': 'Employee_ID', 'employees': 'Employee_ID', 'empid': 'Employee_ID', 'employee id': 'Employee_ID', 'emp id': 'Employee_ID',
+    'analyst': 'Job_Title', 'analysts': 'Job_Title',
+    'total': 'count', 'all': 'no_filter', 'every': 'no_filter', 'everyone': 'no_filter',
+    'how many': 'count', 'what are': 'list_unique', 'list': 'list_unique',
+    'number of': 'count', 'count': 'count',
+    'working hours': 'Overtime_Hours', 'hours': 'Overtime_Hours',
+    'projects': 'Number_of_Projects', 'number of projects': 'Number_of_Projects',
+    'promotion': 'Number_of_Projects', 'promotions': 'Number_of_Projects', 'promotion rate': 'Number_of_Projects',
+    'performance level': 'Performance_Level', 'satisfaction level': 'Satisfaction_Level', 'retention risk level': 'Retention_Risk_Level'
+}
+
+COLUMN_KEYWORDS_BY_LENGTH = sorted(COLUMN_KEYWORDS, key=len, reverse=True)
+SORTABLE_COLUMNS = ['Performance_Score', 'Annual Salary', 'Employee_Satisfaction_Score', 'Productivity score', 'Number_of_Projects',
+                    'Overtime_Hours', 'Age', 'Years_At_Company', 'Retension risk index']
+GROUPABLE_COLUMNS = ['Department', 'Job_Title', 'Gender', 'Remote_Work_Category', 'Performance_Level', 'Satisfaction_Level', 'Retention_Risk_Level']
+COUNT_GROUP_PATTERN = r'\b(?:by|per|in\s+each|for\s+each)\s+(.+)|\b(\w+(?:\s+\w+)?)[\s-]wise\b'
+
 def map_keyword_to_column(keyword, columns):
-    keyword_map = {
-        'department': 'Department', 'dept': 'Department', 'departments': 'Department',
-        'job title': 'Job_Title', 'job titles': 'Job_Title', 'jobtitle': 'Job_Title', 'jobtitles': 'Job_Title',
-        'gender': 'Gender', 'work mode': 'Remote_Work_Category', 'remote work': 'Remote_Work_Category', 'remote': 'Remote_Work_Category',
-        'salary': 'Annual Salary', 'pay': 'Annual Salary', 'wage': 'Annual Salary',
-        'performance': 'Performance_Score', 'performance score': 'Performance_Score', 'performance index': 'Performance_Score',
-        'satisfaction': 'Employee_Satisfaction_Score', 'satisfaction score': 'Employee_Satisfaction_Score',
-        'productivity': 'Productivity score', 'retention': 'Retension risk index', 'retention risk': 'Retension risk index',
-        'age': 'Age', 'hire date': 'Hire_Date', 'years at company': 'Years_At_Company',
-        'male': 'Gender', 'males': 'Gender', 'female': 'Gender', 'females': 'Gender',
-        'employee': 'Employee_ID', 'employees': 'Employee_ID', 'empid': 'Employee_ID', 'employee id': 'Employee_ID', 'emp id': 'Employee_ID',
-        'analyst': 'Job_Title', 'analysts': 'Job_Title',
-        'total': 'count', 'all': 'no_filter', 'every': 'no_filter', 'everyone': 'no_filter',
-        'how many': 'count', 'what are': 'list_unique', 'list': 'list_unique',
-        'number of': 'count', 'count': 'count',
-        'working hours': 'Overtime_Hours', 'hours': 'Overtime_Hours',
-        'projects': 'Number_of_Projects', 'number of projects': 'Number_of_Projects',
-        'promotion': 'Number_of_Projects', 'promotions': 'Number_of_Projects', 'promotion rate': 'Number_of_Projects',
-        'performance level': 'Performance_Level', 'satisfaction level': 'Satisfaction_Level', 'retention risk level': 'Retention_Risk_Level'
-    }
-    for key, value in keyword_map.items():
+    # Longest synonym first, so "retention risk level" maps to the level rather than the risk index
+    for key in COLUMN_KEYWORDS_BY_LENGTH:
         if key in keyword.lower():
-            return value
+            return COLUMN_KEYWORDS[key]
     keyword = keyword.lower()
     matches = process.extract(keyword, columns, scorer=fuzz.token_sort_ratio)
     best_match, score = matches[0] if matches else (None, 0)
     return best_match if score >= 80 else None
 
+def mentioned_column(query, candidates):
+    # First candidate column the query names, by its own name or one of its COLUMN_KEYWORDS synonyms
+    for col in candidates:
+        keywords = [col.lower()] + [key for key, value in COLUMN_KEYWORDS.items() if value == col]
+        if any(re.search(rf'\b{re.escape(keyword)}\b', query) for keyword in keywords):
+            return col
+    return None
+
 def suggest_chart(query, columns_detected):
     query = query.lower().strip()
     categorical_columns = ['Department', 'Job_Title', 'Gender', 'Remote_Work_Category', 'Performance_Level', 'Satisfaction_Level', 'Retention_Risk_Level']
@@ -263,6 +1270,77 @@ def suggest_chart(query, columns_detected):
         return 'table'
     return 'table'
 
+# Chat typeahead. Query templates, column synonyms and the Department/Job_Title/Employee_ID values are kept
+# as one lowercase-sorted key array per data version; a prefix lookup is a bisect plus a scan of the matching
+# run, so completion cost does not grow with the number of employees.
+TYPEAHEAD_LIMIT = 5
+TYPEAHEAD_MAX_WORDS = 3
+TYPEAHEAD_COLUMNS = ['Department', 'Job_Title', 'Employee_ID']
+CHAT_QUERY_TEMPLATES = [
+    "Employee 123", "Employee ID with salary > 90000", "Average salary for analyst",
+    "Average salary by department", "Median salary by department", "90th percentile salary by department",
+    "Number of distinct job titles by department", "How many employees in each department", "Number of employees by remote work",
+    "List departments", "List job titles", "Top 5 employees by salary", "Top 5 employees by performance score",
+    "Top 3 employees by salary in each department", "How many females", "How many employees with low satisfaction level",
+    "Show employees with low satisfaction level", "Show employees with high retention risk level",
+    "Salary distribution", "Salary trend this year", "Employee count trend this quarter",
+    "Help", "Hello", "What's the time?", "Tell me a joke"
+]
+
+class PrefixIndex:
+    def __init__(self, phrases):
+        entries = sorted({phrase.lower(): phrase for phrase in phrases}.items())
+        self.keys = [key for key, _ in entries]
+        self.phrases = [phrase for _, phrase in entries]
+
+    def complete(self, prefix, limit=TYPEAHEAD_LIMIT):
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\uffff", lo=start)
+        return self.phrases[start:min(end, start + limit)]
+
+class TypeaheadIndex:
+    def __init__(self, df):
+        self.templates = PrefixIndex(CHAT_QUERY_TEMPLATES)
+        terms = list(COLUMN_KEYWORDS)
+        for column in TYPEAHEAD_COLUMNS:
+            if column in df.columns:
+                terms.extend(df[column].dropna().astype(str).unique())
+        self.terms = PrefixIndex(terms)
+
+    def suggest(self, text, limit=TYPEAHEAD_LIMIT):
+        typed = text.lstrip()
+        lowered = typed.lower()
+        if not lowered:
+            return []
+        suggestions = list(self.templates.complete(lowered, limit))
+        # Complete the trailing one to three words against the vocabulary, longest fragment first
+        starts = [m.start() for m in re.finditer(r'\S+', typed)][-TYPEAHEAD_MAX_WORDS:]
+        for start in starts:
+            for term in self.terms.complete(lowered[start:], limit):
+                suggestions.append(typed[:start] + term)
+        seen = {lowered}
+        unique = []
+        for suggestion in suggestions:
+            if suggestion.lower() not in seen:
+                seen.add(suggestion.lower())
+                unique.append(suggestion)
+        return unique[:limit]
+
+def chat_suggestions(text):
+    index = tenant.cached('typeahead', data_version, lambda previous: TypeaheadIndex(df))
+    return index.suggest(text)
+
+def use_chat_suggestion(suggestion):
+    st.session_state.chat_input = suggestion
+
+# Compound filter predicates are parsed by predicates.py against the categorical values of the current data version
+def vocabulary_values(column):
+    # Known values of a categorical column, longest first so multi-word values win over their prefixes
+    if df.empty or column not in df.columns:
+        return []
+    return tenant.cached(f"vocabulary:{column}", data_version,
+                         lambda previous: sorted(df[column].dropna().astype(str).unique(), key=len, reverse=True))
+
 def parse_query(query, columns):
     query = query.lower().strip()
     result = {
@@ -285,7 +1363,7 @@ def parse_query(query, columns):
 
     # Set default columns based on query topic, unless aggregation
     query_keywords = query.lower().split()
-    is_aggregation = any(word in query_keywords for word in ['average', 'mean', 'count', 'sum', 'max', 'maximum', 'min', 'minimum', 'how many', 'number of', 'total'])
+    is_aggregation = any(word in query_keywords for word in ['average', 'mean', 'count', 'sum', 'max', 'maximum', 'min', 'minimum', 'how many', 'number of', 'total', 'median', 'percentile', 'distinct'])
     if not is_aggregation:
         if any(k in query_keywords for k in ['salary', 'pay', 'wage']):
             result['columns'] = ['Employee_ID', 'Annual Salary']
@@ -312,13 +1390,13 @@ def parse_query(query, columns):
     list_patterns = [
         (r'^(list\s+|show\s+|get\s+|what\s+are\s+the\s+|all\s+|total\s+|)(departments?|job\s+titles?|work\s+modes?|remote\s+works?|genders?|performance\s+levels?|satisfaction\s+levels?|retention\s+risk\s+levels?)\b', None),
         (r'^(list\s+|show\s+|get\s+|what\s+are\s+the\s+|all\s+|)(unique\s+|distinct\s+|)(departments?|job\s+titles?|work\s+modes?|remote\s+works?|genders?|performance\s+levels?|satisfaction\s+levels?|retention\s+risk\s+levels?)\b', None),
-        (r'^(list\s+|show\s+|get\s+|what\s+are\s+the\s+|all\s+|total\s+|)(employee\s+ids?|employees?|empids?)(?:\s+(in|across|for|)\s*(all\s+|every\s+|)(departments?|dept)?)?\b', 'Employee_ID')
+        (r'^(list\s+|show\s+|get\s+|what\s+are\s+the\s+|all\s+|total\s+|)(employee\s+ids?|employees?|empids?)(?:\s+(in|across|for|)\s*(all\s+|every\s+|)(departments?|dept)?)?\s*$', 'Employee_ID')
     ]
     for pat, default_col in list_patterns:
         match = re.search(pat, query)
         if match:
             col_keyword = match.group(2) or match.group(3) or 'employee ids'
-            col = default_col or map_keyword(col_keyword)
+            col = default_col or map_keyword_to_column(col_keyword, columns)
             preposition = match.group(4) if len(match.groups()) > 4 else None
             all_modifier = match.group(5) if len(match.groups()) > 5 else None
             if col:
@@ -340,12 +1418,13 @@ def parse_query(query, columns):
             (r'count\s+of\s+(males?|females?)', 'Gender'),
             (r'how\s+many\s+(males?|females?)', 'Gender'),
             (r'number\s+of\s+(males?|females?)', 'Gender'),
-            (r'^(how\s+many\s+|number\s+of\s+|total\s+|count\s+)(employee\s+ids?|employees?|empids?)(?:\s+(in|across|for|)\s*(all\s+|every\s+|)(departments?|dept)?)?\b', 'Employee_ID'),
-            (r'^(how\s+many\s+|number\s+of\s+|total\s+|count\s+)(employee\s+ids?|employees?|empids?)\s+(?:with\s+|having\s+|)\b(high|medium|low)\s+(performance\s+level|satisfaction\s+level|retention\s+risk\s+level)\b', 'level')
+            (r'^(how\s+many\s+|number\s+of\s+|total\s+|count\s+)(employee\s+ids?|employees?|empids?)\s+(?:with\s+|having\s+|)\b(high|medium|low)\s+(performance\s+level|satisfaction\s+level|retention\s+risk\s+level)\b', 'level'),
+            (r'^(how\s+many\s+|number\s+of\s+|total\s+|count\s+)(employee\s+ids?|employees?|empids?)(?:\s+(in|across|for|)\s*(all\s+|every\s+|)(departments?|dept)?)?\b', 'Employee_ID')
         ]
+        count_group_match = re.search(COUNT_GROUP_PATTERN, query)
         for pat, col in count_value_patterns:
             match = re.search(pat, query)
-            if match:
+            if match and not (col == 'Employee_ID' and count_group_match):
                 if col == 'Gender':
                     count_val = match.group(1).rstrip('s').title()
                     if count_val in df['Gender'].unique():
@@ -372,22 +1451,47 @@ def parse_query(query, columns):
                         result['columns'] = [f"count({count_val})"]
                 break
 
+    # Percentile and approximate distinct-count aggregates (answered from mergeable sketches)
+    if result['operation'] == 'filter':
+        percentile_match = re.search(r'\b(median)\b|\b(\d{1,2}(?:\.\d+)?)(?:st|nd|rd|th)?\s+percentile\b|\bp(\d{1,2})\b', query)
+        distinct_match = re.search(r'\b(?:distinct|unique)\s+([\w\s]+?)(?=\s+(?:by|per|in|for|with|across)\b|\?|$)', query)
+        group_match = re.search(r'\b(?:by|per)\s+(\w+(?:\s+\w+)?)', query)
+        group_col = map_keyword_to_column(group_match.group(1), columns) if group_match else None
+        agg_func, agg_col, quantile = None, None, None
+        if percentile_match:
+            if percentile_match.group(1):
+                agg_func, quantile = 'median', 0.5
+            else:
+                percent = float(percentile_match.group(2) or percentile_match.group(3))
+                agg_func, quantile = f"p{percent:g}", percent / 100
+            percentile_keywords = [
+                ('salary', 'Annual Salary'), ('pay', 'Annual Salary'), ('age', 'Age'),
+                ('performance', 'Performance_Score'), ('satisfaction', 'Employee_Satisfaction_Score'),
+                ('productivity', 'Productivity score'), ('retention', 'Retension risk index'),
+                ('overtime', 'Overtime_Hours'), ('hours', 'Overtime_Hours'), ('projects', 'Number_of_Projects')
+            ]
+            agg_col = next((col for keyword, col in percentile_keywords if re.search(rf'\b{keyword}', query)), None)
+        elif distinct_match and any(word in query for word in ['count', 'number of', 'how many']):
+            agg_func = 'approx_distinct'
+            agg_col = map_keyword_to_column(distinct_match.group(1).replace('count of', '').replace('number of', ''), columns)
+        if agg_func and agg_col:
+            label = f"{agg_func}({agg_col})"
+            result['operation'] = 'group_aggregate' if group_col else 'aggregate'
+            result['agg_func'] = agg_func
+            result['agg_column'] = agg_col
+            result['quantile'] = quantile
+            result['group_by'] = group_col
+            result['columns'] = [group_col, label] if group_col else [label]
+
     # Grouped aggregation
-    if result['operation'] == 'filter' and any(phrase in query for word in ['count', 'how many', 'number of', 'total'] for phrase in [f"{word} by", f"{word} per", f"{word}.*wise"]):
-        result['operation'] = 'group_aggregate'
-        result['agg_func'] = 'count'
-        for col in columns:
-            if col.lower() in query or map_keyword(col.lower()) == col:
-                result['group_by'] = col
-                result['columns'] = [col, 'Count']
-                break
-        if not result['group_by']:
-            for keyword in ['department', 'gender', 'job title', 'work mode', 'remote work', 'performance level', 'satisfaction level', 'retention risk level']:
-                matched = map_keyword(keyword)
-                if matched:
-                    result['group_by'] = matched
-                    result['columns'] = [matched, 'Count']
-                    break
+    count_group_match = re.search(COUNT_GROUP_PATTERN, query)
+    if result['operation'] == 'filter' and count_group_match and any(word in query for word in ['count', 'how many', 'number of', 'total']):
+        group_col = mentioned_column(count_group_match.group(1) or count_group_match.group(2), [col for col in GROUPABLE_COLUMNS if col in columns])
+        if group_col:
+            result['operation'] = 'group_aggregate'
+            result['agg_func'] = 'count'
+            result['group_by'] = group_col
+            result['columns'] = [group_col, 'Count']
 
     # General aggregation with conditions
     if result['operation'] == 'filter' and any(word in query for word in ['average', 'mean', 'count', 'sum', 'max', 'maximum', 'min', 'minimum', 'how many', 'number of', 'total']):
@@ -419,10 +1523,18 @@ def parse_query(query, columns):
                 break
         if not result['agg_column']:
             for col in columns:
-                if col.lower() in query or map_keyword(query) == col:
+                if col.lower() in query or map_keyword_to_column(query, columns) == col:
                     result['agg_column'] = col
                     break
 
+        group_match = re.search(r'\b(?:by|per)\s+(.+)', query)
+        group_col = mentioned_column(group_match.group(1), [col for col in GROUPABLE_COLUMNS if col in columns]) if group_match else None
+        if group_col and result['agg_func'] != 'count' and result['agg_column']:
+            label = f"{result['agg_func']}({result['agg_column']})"
+            result['operation'] = 'group_aggregate'
+            result['group_by'] = group_col
+            result['columns'] = [group_col, label]
+
         # Handle job role filter for aggregation
         job_role_match = re.search(r'(?:for|of|in|with|as)\s+([\w\s]+?)(?:\s+job\s+role|\b)', query)
         if job_role_match:
@@ -431,50 +1543,19 @@ def parse_query(query, columns):
             if 'Job_Title' not in result['columns']:
                 result['columns'].append('Job_Title')
 
-    # Complex filter conditions with prepositions and level columns
-    complex_patterns = [
-        (r'(?:in|across|for|of)\s+([\w\s&]+)\s*(department|dept)', 'Department', '=='),
-        (r'gender\s+(\w+)', 'Gender', '=='),
-        (r'job\s+title\s+([\w\s]+)', 'Job_Title', '=='),
-        (r'(analysts?)', 'Job_Title', 'contains'),
-        (r'age\s*>\s*(\d+)', 'Age', '>'),
-        (r'age\s*<\s*(\d+)', 'Age', '<'),
-        (r'age\s+(\d+)', 'Age', '=='),
-        (r'salary\s*>\s*([\d,]+)', 'Annual Salary', '>'),
-        (r'salary\s*<\s*([\d,]+)', 'Annual Salary', '<'),
-        (r'salary\s*=\s*([\d,]+)', 'Annual Salary', '=='),
-        (r'performance score\s*>\s*(\d+)', 'Performance_Score', '>'),
-        (r'performance score\s*<\s*(\d+)', 'Performance_Score', '<'),
-        (r'performance score\s+(\d+)', 'Performance_Score', '=='),
-        (r'hired after\s+(\d{4})', 'Hire_Date', '>'),
-        (r'hired before\s+(\d{4})', 'Hire_Date', '<'),
-        (r'hired between\s+(\d{4}-\d{2}-\d{2})\s+and\s+(\d{4}-\d{2}-\d{2})', 'Hire_Date', 'between'),
-        (r'(high|medium|low)\s+(performance\s+level|satisfaction\s+level|retention\s+risk\s+level)', None, 'level')
-    ]
-    for pat, col, op in complex_patterns:
-        match = re.search(pat, query)
-        if match:
-            if op == 'level':
-                level_val = match.group(1).title()
-                level_col = match.group(2).replace(' ', '_').title()
-                if level_col in ['Performance_Level', 'Satisfaction_Level', 'Retention_Risk_Level'] and level_val in ['Low', 'Medium', 'High']:
-                    result['conditions'].append((level_col, '==', level_val))
-                    if level_col not in result['columns']:
-                        result['columns'].append(level_col)
-            elif op == 'between':
-                start_date = pd.to_datetime(match.group(1))
-                end_date = pd.to_datetime(match.group(2))
-                result['conditions'].append((col, 'between', (start_date, end_date)))
-            else:
-                val = match.group(1).strip().title() if op in ['==', 'contains'] and col not in ['Age', 'Performance_Score', 'Hire_Date', 'Annual Salary'] else \
-                      pd.to_datetime(f"{match.group(1)}-01-01") if col == 'Hire_Date' else \
-                      float(match.group(1).replace(',', '')) if col == 'Annual Salary' else int(match.group(1))
-                result['conditions'].append((col, op, val))
-            if col and col not in result['columns'] and not is_aggregation:
-                result['columns'].append(col)
-            # Ensure Employee_ID is included for >, <, or employee id queries
-            if (op in ['>', '<'] or is_comparison or is_employee_id_query) and not is_aggregation and 'Employee_ID' not in result['columns']:
-                result['columns'].insert(0, 'Employee_ID')
+    # Filter conditions: every clause is parsed (not just the first match per pattern) into a predicate AST
+    # joined by and/or/not; conditions collected above (e.g. the aggregation job role) are ANDed in front
+    extra_conditions = list(result['conditions'])
+    predicate = parse_predicate(query, vocabulary_values)
+    extra_conditions = [cond for cond in extra_conditions if tuple(cond) not in predicate_leaves(predicate)]
+    result['predicate'] = combine_predicates('and', [('cmp',) + tuple(cond) for cond in extra_conditions] + [predicate])
+    result['conditions'] = extra_conditions + predicate_leaves(predicate)
+    for col, op, val in predicate_leaves(predicate):
+        if col and col not in result['columns'] and not is_aggregation:
+            result['columns'].append(col)
+        # Ensure Employee_ID is included for >, <, or employee id queries
+        if (op in ['>', '<', '>=', '<='] or is_comparison or is_employee_id_query) and not is_aggregation and 'Employee_ID' not in result['columns']:
+            result['columns'].insert(0, 'Employee_ID')
 
     # Department-wise top N employees
     if result['operation'] == 'filter' and any(phrase in query for phrase in ['each department', 'by department', 'department wise', 'per department', 'in each department']):
@@ -482,11 +1563,7 @@ def parse_query(query, columns):
         result['group_by'] = 'Department'
         limit_match = re.search(r'(top|highest)\s+(\d+)', query)
         result['limit'] = int(limit_match.group(2)) if limit_match else 5
-        result['sort_column'] = 'Performance_Score'
-        for col in ['Performance_Score', 'Annual Salary', 'Employee_Satisfaction_Score', 'Productivity score', 'Number_of_Projects', 'Overtime_Hours']:
-            if col.lower() in query or map_keyword(col.lower()) == col:
-                result['sort_column'] = col
-                break
+        result['sort_column'] = mentioned_column(query, [col for col in SORTABLE_COLUMNS if col in columns]) or 'Performance_Score'
         result['sort'] = 'desc'
         result['columns'] = ['Employee_ID', 'Department', 'Job_Title', result['sort_column']]
 
@@ -496,16 +1573,9 @@ def parse_query(query, columns):
         result['sort'] = 'desc'
         limit_match = re.search(r'(top|highest)\s+(\d+)', query)
         result['limit'] = int(limit_match.group(2)) if limit_match else 5
-        for col in columns:
-            if col.lower() in query or map_keyword(query) == col:
-                result['sort_column'] = col
-                break
-        if not result['sort_column']:
-            for keyword in ['performance', 'salary', 'satisfaction', 'productivity', 'working hours', 'projects', 'promotion']:
-                matched = map_keyword(keyword)
-                if matched:
-                    result['sort_column'] = matched
-                    break
+        result['sort_column'] = mentioned_column(query, [col for col in SORTABLE_COLUMNS if col in columns]) or 'Performance_Score'
+        if result['sort_column'] not in result['columns']:
+            result['columns'].append(result['sort_column'])
         # Ensure Employee_ID is included for top queries
         if 'Employee_ID' not in result['columns']:
             result['columns'].insert(0, 'Employee_ID')
@@ -514,36 +1584,23 @@ def parse_query(query, columns):
         result['sort'] = 'asc'
         limit_match = re.search(r'(bottom|lowest)\s+(\d+)', query)
         result['limit'] = int(limit_match.group(2)) if limit_match else 5
-        for col in columns:
-            if col.lower() in query or map_keyword(query) == col:
-                result['sort_column'] = col
-                break
-        if not result['sort_column']:
-            for keyword in ['performance', 'salary', 'satisfaction', 'productivity', 'working hours', 'projects', 'promotion']:
-                matched = map_keyword(keyword)
-                if matched:
-                    result['sort_column'] = matched
-                    break
+        result['sort_column'] = mentioned_column(query, [col for col in SORTABLE_COLUMNS if col in columns]) or 'Performance_Score'
+        if result['sort_column'] not in result['columns']:
+            result['columns'].append(result['sort_column'])
         # Ensure Employee_ID is included for bottom queries
         if 'Employee_ID' not in result['columns']:
             result['columns'].insert(0, 'Employee_ID')
 
     return result
 
-def process_query(df, query_info):
-    filtered_df = df.copy()
-    for col, op, val in query_info['conditions']:
-        if op == '==':
-            filtered_df = filtered_df[filtered_df[col] == val]
-        elif op == '>':
-            filtered_df = filtered_df[filtered_df[col] > val]
-        elif op == '<':
-            filtered_df = filtered_df[filtered_df[col] < val]
-        elif op == 'between':
-            start_date, end_date = val
-            filtered_df = filtered_df[(filtered_df[col] >= start_date) & (filtered_df[col] <= end_date)]
-        elif op == 'contains':
-            filtered_df = filtered_df[filtered_df[col].str.contains(val, case=False, na=False)]
+def process_query(df, query_info, sketches=None):
+    # Shallow copy: shares column data with the shared frame, copy-on-write protects it from the casts below
+    filtered_df = df.copy(deep=False)
+    predicate = query_info.get('predicate')
+    if predicate is None and query_info['conditions']:
+        predicate = combine_predicates('and', [('cmp',) + tuple(cond) for cond in query_info['conditions']])
+    if predicate is not None:
+        filtered_df = filtered_df[compile_predicate(predicate, filtered_df)]
     if query_info['operation'] == 'count_value':
         agg_col = query_info.get('agg_column')
         count_val = query_info.get('count_value')
@@ -551,6 +1608,10 @@ def process_query(df, query_info):
             count = len(filtered_df[filtered_df[agg_col] == count_val])
             return pd.DataFrame({f"count({count_val})": [count]})
         return pd.DataFrame({"Error": ["No valid column or value for counting"]})
+    if query_info['operation'] == 'count':
+        return pd.DataFrame({"count(employees)": [len(filtered_df)]})
+    if query_info['operation'] in ['aggregate', 'group_aggregate'] and (query_info.get('quantile') is not None or query_info.get('agg_func') == 'approx_distinct'):
+        return sketch_aggregate(filtered_df, query_info, sketches)
     if query_info['operation'] == 'aggregate':
         agg_col = query_info.get('agg_column')
         agg_func = query_info.get('agg_func')
@@ -570,6 +1631,11 @@ def process_query(df, query_info):
                 result = filtered_df[group_col].value_counts().reset_index()
                 result.columns = [group_col, 'Count']
                 return result
+            agg_col = query_info.get('agg_column')
+            if agg_col:
+                values = pd.to_numeric(filtered_df[agg_col], errors='coerce')
+                result = values.groupby(filtered_df[group_col], observed=True).agg(agg_func)
+                return pd.DataFrame({group_col: result.index, f"{agg_func}({agg_col})": result.to_numpy()})
         return pd.DataFrame({"Error": ["No valid column for grouping"]})
     if query_info['operation'] == 'list_unique':
         list_col = query_info.get('list_column')
@@ -583,9 +1649,9 @@ def process_query(df, query_info):
         limit = query_info.get('limit', 5)
         if group_col and sort_col:
             filtered_df[sort_col] = pd.to_numeric(filtered_df[sort_col], errors='coerce')
-            result = filtered_df.groupby(group_col).apply(
-                lambda x: x.nlargest(limit, sort_col, keep='all')
-            ).reset_index(drop=True)
+            # Same rows as nlargest(limit, keep='all') per group, ties at the cut included
+            rank = filtered_df.groupby(group_col, observed=True)[sort_col].rank(method='min', ascending=False)
+            result = filtered_df[rank <= limit].sort_values([group_col, sort_col], ascending=[True, False]).reset_index(drop=True)
             return result[query_info['columns']]
         return pd.DataFrame({"Error": ["No valid column for grouping or sorting"]})
     if query_info['operation'] == 'sort':
@@ -605,37 +1671,80 @@ def process_query(df, query_info):
         return filtered_df.reset_index(drop=True) if not filtered_df.empty else pd.DataFrame({"Message": ["No results found."]})
     return pd.DataFrame({"Error": ["Unable to understand your query. Try again."]})
 
+# Trend questions are answered from the snapshot history instead of the current frame only
+TREND_PHRASES = ['over time', 'trend', 'changed', 'history', 'this quarter', 'this year']
+
+def history_since(user_input):
+    now = pd.Timestamp.now()
+    if 'this quarter' in user_input:
+        return now.to_period('Q').start_time.isoformat(timespec='seconds')
+    if 'this year' in user_input:
+        return now.to_period('Y').start_time.isoformat(timespec='seconds')
+    return None
+
+def trend_query_info(user_input, query_info, df):
+    if query_info['operation'] in ['aggregate', 'count', 'count_value']:
+        return query_info
+    if query_info['operation'] != 'filter':
+        return None
+    # A trend question over a plain filter ("how has retention risk in Sales changed") tracks the mean of the metric it names
+    for keyword in sorted(COLUMN_KEYWORDS, key=len, reverse=True):
+        column = COLUMN_KEYWORDS[keyword]
+        if (column in df.columns and column != HISTORY_KEY and pd.api.types.is_numeric_dtype(df[column])
+                and re.search(rf'\b{re.escape(keyword)}\b', user_input)):
+            return dict(query_info, operation='aggregate', agg_func='mean', agg_column=column, columns=[f"mean({column})"])
+    return None
+
+def get_trend_response(user_input, df, query_info):
+    history = tenant.store.history
+    current = process_query(df, query_info)
+    if history is None or current.empty or 'Error' in current.columns:
+        return None
+    value_col = current.columns[0]
+    # Each snapshot is narrowed to the current sidebar selection, like the current frame passed in as df
+    trend_df = history.aggregate(lambda frame: process_query(select_rows(frame), query_info).iloc[0, 0], since=history_since(user_input))
+    if len(trend_df) < 2:
+        response = f"I only have one snapshot so far, so I can't show a trend yet. Current {value_col}: {current.iloc[0, 0]:.2f}"
+        st.session_state.chat_history.append({"role": "bot", "message": response})
+        return response, None, None, None
+    trend_df = trend_df.rename(columns={'Value': value_col})
+    trend_info = dict(query_info, operation='trend', trend_column=value_col, columns=['Snapshot', value_col])
+    first, last = trend_df[value_col].iloc[0], trend_df[value_col].iloc[-1]
+    response = f"{value_col} moved from {first:.2f} to {last:.2f} across {len(trend_df)} snapshots."
+    set_last_result(trend_df, trend_info)
+    st.session_state.chat_history.append({"role": "bot", "message": response})
+    return response, trend_info, trend_df, 'line_chart'
+
 def get_chatbot_response(user_input, df, columns):
     user_input = user_input.lower().strip()
     st.session_state.last_query = user_input
 
-    # Check conversation history for context
-    recent_history = [chat for chat in st.session_state.chat_history[-6:] if chat['role'] == 'user'][-3:]  # Last 3 user messages
-    context_keywords = []
-    context_employee_id = None
-    for chat in recent_history:
-        context_keywords.extend(chat['message'].lower().split())
-        emp_id_match = re.search(r'(?:employee|emp\s*id|employee\s*id)\s*(\d+)', chat['message'])
-        if emp_id_match:
-            context_employee_id = emp_id_match.group(1)
+    # Read the context of the previous turns, then fold this turn into it. render_chatbot calls this once per
+    # submitted input (see chat_turn), so fragment reruns for the same input don't observe it again
+    context = st.session_state.conversation_context
+    has_history = bool(context)
+    context_related = context.related(user_input)
+    context_employee_id = context.mentioned_employee()
+    context.observe(user_input)
 
     # Check for intents
     for intent in intents:
         if re.match(intent['pattern'], user_input, re.IGNORECASE):
             response = intent['response']
-            if recent_history:
+            if has_history:
                 response = f"Following our chat, {response.lower()[0] + response[1:]}"
             st.session_state.chat_history.append({"role": "bot", "message": response})
             return response, None, None, None
 
     # Check for follow-up questions
     is_follow_up = any(keyword in user_input for keyword in ['more', 'details', 'further', 'tell me more'])
-    emp_id_match = re.search(r'(?:employee|emp\s*id|employee\s*id)\s*(\d+)', user_input)
-    if is_follow_up and st.session_state.last_result_df is not None:
-        if emp_id_match and emp_id_match.group(1) == st.session_state.last_employee_id:
+    emp_id_match = EMPLOYEE_MENTION_PATTERN.search(user_input)
+    last_result_df = get_last_result() if is_follow_up else None
+    if is_follow_up and last_result_df is not None:
+        if emp_id_match and emp_id_match.group(1) == context.last_employee_id:
             # Provide more details for the same employee
             emp_id = emp_id_match.group(1)
-            emp_data = df[df['Employee_ID'] == emp_id]
+            emp_data = df[df['Employee_ID'].astype(str) == emp_id]
             if not emp_data.empty:
                 row = emp_data.iloc[0]
                 additional_columns = ['Annual Salary', 'Number_of_Projects', 'Overtime_Hours', 'Years_At_Company']
@@ -658,19 +1767,20 @@ def get_chatbot_response(user_input, df, columns):
                 response = f"No additional details found for Employee {emp_id}."
                 st.session_state.chat_history.append({"role": "bot", "message": response})
                 return response, None, None, None
-        elif st.session_state.last_query_info:
-            # Expand columns for previous query
-            query_info = st.session_state.last_query_info.copy()
-            result_df = st.session_state.last_result_df
+        elif context.last_query_info:
+            # Expand columns for previous query, reusing its cached rows when the data hasn't changed
+            query_info = dict(context.last_query_info, columns=list(context.last_query_info['columns']))
+            result_df = last_result_df
             if 'Employee_ID' in result_df.columns:
                 new_columns = ['Employee_ID', 'Department', 'Job_Title', 'Annual Salary', 'Number_of_Projects', 'Overtime_Hours']
                 new_columns = [col for col in new_columns if col in df.columns and col not in query_info['columns']]
                 query_info['columns'].extend(new_columns[:2])  # Add up to 2 new columns
-                result_df = process_query(df, query_info)
+                expanded_df = expand_last_result(result_df, new_columns[:2])
+                result_df = expanded_df if expanded_df is not None else process_query(df, query_info)
                 if not result_df.empty and 'Error' not in result_df.columns:
                     response = f"Following up on your previous query, here are more details: Found {len(result_df)} employees."
+                    set_last_result(result_df, query_info)
                     st.session_state.chat_history.append({"role": "bot", "message": response})
-                    st.dataframe(result_df)
                     return response, query_info, result_df, suggest_chart(user_input, query_info['columns'])
                 else:
                     response = "Sorry, I cannot provide more details for this query."
@@ -681,14 +1791,6 @@ def get_chatbot_response(user_input, df, columns):
             st.session_state.chat_history.append({"role": "bot", "message": response})
             return response, None, None, None
 
-    # Check for context-related queries (e.g., same topic as previous)
-    context_related = False
-    if recent_history:
-        for keyword in context_keywords:
-            if keyword in user_input and keyword not in ['employee', 'emp', 'id', 'more', 'details', 'further']:
-                context_related = True
-                break
-
     # Handle specific employee ID queries
     emp_id_patterns = [
         r'(?:employee|emp\s*id|employee\s*id)\s*(\d+)',  # Matches "employee 123", "emp id 123", "employee id 123"
@@ -700,7 +1802,7 @@ def get_chatbot_response(user_input, df, columns):
         if match:
             emp_id = match.group(1)
             try:
-                emp_data = df[df['Employee_ID'] == emp_id]
+                emp_data = df[df['Employee_ID'].astype(str) == emp_id]
                 if not emp_data.empty:
                     row = emp_data.iloc[0]
                     response = (f"Employee ID: {emp_id}\n"
@@ -714,7 +1816,7 @@ def get_chatbot_response(user_input, df, columns):
                         response = f"Continuing our discussion about Employee {emp_id}, here are the details:\n{response}"
                     elif context_related:
                         response = f"Moving on from our previous chat, here are details for Employee {emp_id}:\n{response}"
-                    st.session_state.last_employee_id = emp_id
+                    context.last_employee_id = emp_id
                     st.session_state.chat_history.append({"role": "bot", "message": response})
                     metrics = pd.DataFrame({
                         'Metric': ['Performance Score', 'Satisfaction Score'],
@@ -737,9 +1839,19 @@ def get_chatbot_response(user_input, df, columns):
     # Handle general queries
     try:
         query_info = parse_query(user_input, columns)
-        result_df = process_query(df, query_info)
-        if result_df.empty or 'Error' in result_df.columns or 'Message' in result_df.columns:
-            error_msg = result_df.get('Error', [''])[0] or result_df.get('Message', [''])[0]
+        if any(phrase in user_input for phrase in TREND_PHRASES):
+            trend_info = trend_query_info(user_input, query_info, df)
+            trend_response = get_trend_response(user_input, df, trend_info) if trend_info else None
+            if trend_response:
+                return trend_response
+        result_df = process_query(df, query_info, sketches=active_sketches)
+        if result_df.empty or 'Message' in result_df.columns:
+            # The question was understood but nothing in the current selection matches it
+            response = "No employees match this question with the current filters."
+            st.session_state.chat_history.append({"role": "bot", "message": response})
+            return response, None, None, None
+        if 'Error' in result_df.columns:
+            error_msg = result_df.get('Error', [''])[0]
             suggestion = "Try queries like 'Employee 123', 'Employee ID with salary > 90000', 'List departments', 'Count of males', 'Average salary for analyst', or 'Employees with high performance level'."
             response = f"Sorry, I cannot understand or answer this question. {suggestion}"
             st.session_state.chat_history.append({"role": "bot", "message": response})
@@ -756,10 +1868,18 @@ def get_chatbot_response(user_input, df, columns):
             count_val = query_info.get('count_value')
             count = result_df[f"count({count_val})"].iloc[0]
             response = f"Count of {count_val}: {count}"
+        elif query_info['operation'] == 'count':
+            response = f"Count of employees: {result_df['count(employees)'].iloc[0]}"
         elif query_info['operation'] == 'group_aggregate':
             group_col = query_info.get('group_by')
-            counts = result_df.set_index(group_col)['Count'].to_dict()
-            response = f"Count by {group_col}: {', '.join([f'{k}: {v}' for k, v in counts.items()])}"
+            value_col = result_df.columns[1]
+            counts = result_df.set_index(group_col)[value_col].to_dict()
+            label = "Count" if value_col == 'Count' else value_col
+            response = f"{label} by {group_col}: {', '.join([f'{k}: {v:,.2f}' if isinstance(v, float) else f'{k}: {v}' for k, v in counts.items()])}"
+        elif query_info['operation'] == 'aggregate' and query_info.get('agg_func') == 'approx_distinct':
+            agg_col = query_info.get('agg_column')
+            value = result_df[f"approx_distinct({agg_col})"].iloc[0]
+            response = f"Approximate distinct count of {agg_col}: {value}"
         elif query_info['operation'] == 'aggregate':
             agg_col = query_info.get('agg_column')
             agg_func = query_info.get('agg_func')
@@ -774,13 +1894,11 @@ def get_chatbot_response(user_input, df, columns):
         
         if context_related:
             response = f"Following up on your previous interest in similar topics, {response.lower()[0] + response[1:]}"
-        elif recent_history:
+        elif has_history:
             response = f"Moving on from our previous chat, {response.lower()[0] + response[1:]}"
         
-        st.session_state.last_result_df = result_df
-        st.session_state.last_query_info = query_info
+        set_last_result(result_df, query_info)
         st.session_state.chat_history.append({"role": "bot", "message": response})
-        st.dataframe(result_df)
         return response, query_info, result_df, chart_type
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
@@ -789,305 +1907,564 @@ def get_chatbot_response(user_input, df, columns):
         return response, None, None, None
 
 # Sidebar: Filters
+# Option lists and the Employee ID index are built once per data version; the ID picker only ever sends
+# one page of matching IDs to the browser, so page weight stays flat as headcount grows
+EMPLOYEE_PICKER_PAGE_SIZE = 50
+
+class EmployeeIdIndex:
+    def __init__(self, values):
+        ids = pd.Series(values).dropna().drop_duplicates()
+        keys = ids.astype(str).to_numpy(dtype=str)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.values = ids.to_numpy()[order]
+
+    def search(self, prefix, page=0, size=EMPLOYEE_PICKER_PAGE_SIZE):
+        start = int(np.searchsorted(self.keys, prefix, side='left'))
+        end = int(np.searchsorted(self.keys, prefix + "\uffff", side='left')) if prefix else len(self.keys)
+        first = min(start + page * size, end)
+        return self.values[first:min(first + size, end)].tolist(), end - start
+
+class FilterOptions:
+    def __init__(self, df):
+        self.departments = df['Department'].dropna().unique().tolist() if not df.empty else []
+        self.job_titles = df['Job_Title'].dropna().unique().tolist() if not df.empty else []
+        self.employee_ids = EmployeeIdIndex(df['Employee_ID'] if not df.empty else [])
+        self.hire_date_range = [df['Hire_Date'].min(), df['Hire_Date'].max()] if not df.empty else [datetime.now(), datetime.now()]
+
+filter_options = tenant.cached('filter_options', data_version, lambda previous: FilterOptions(df))
 st.sidebar.header("Filters")
-departments = df['Department'].dropna().unique().tolist() if not df.empty else []
-job_titles = df['Job_Title'].dropna().unique().tolist() if not df.empty else []
+departments = filter_options.departments
+job_titles = filter_options.job_titles
 remote_options = ['All', 'Work From Home', 'Work From Office', 'Hybrid']
-employee_ids = ['All'] + df['Employee_ID'].dropna().astype(str).unique().tolist() if not df.empty else ['All']
-selected_employee = st.sidebar.selectbox("Select Employee ID", employee_ids)
+def reset_employee_page():
+    st.session_state.pop("employee_page", None)
+
+employee_search = st.sidebar.text_input("Search Employee ID", key="employee_search", on_change=reset_employee_page).strip()
+employee_page_ids, employee_matches = filter_options.employee_ids.search(employee_search)
+employee_page_count = max(1, -(-employee_matches // EMPLOYEE_PICKER_PAGE_SIZE))
+if employee_page_count > 1:
+    employee_page = st.sidebar.number_input("Employee ID page", min_value=1, max_value=employee_page_count, value=1, key="employee_page")
+    employee_page_ids, _ = filter_options.employee_ids.search(employee_search, int(employee_page) - 1)
+selected_employee = st.sidebar.selectbox("Select Employee ID", ['All'] + employee_page_ids, format_func=str, key="selected_employee")
+st.sidebar.caption(f"{employee_matches} matching IDs, page size {EMPLOYEE_PICKER_PAGE_SIZE}")
 selected_department = st.sidebar.selectbox("Select Department", ["All"] + departments)
 selected_job = st.sidebar.selectbox("Select Job Title", ["All"] + job_titles)
 selected_remote = st.sidebar.selectbox("Select Remote Work Type", remote_options)
-date_range = st.sidebar.date_input("Filter by Hire Date Range", [df['Hire_Date'].min(), df['Hire_Date'].max()] if not df.empty else [datetime.now(), datetime.now()])
+date_range = st.sidebar.date_input("Filter by Hire Date Range", filter_options.hire_date_range)
+if dataset.ingest_report:
+    with st.sidebar.expander("Data Sources"):
+        st.dataframe(pd.DataFrame(dataset.ingest_report), use_container_width=True)
+with st.sidebar.expander("Tenant Stats"):
+    # Other organizations' tenant ids and usage are only shown to administrators
+    tenant_stats = tenant_registry.stats()
+    if not is_tenant_admin and not tenant_stats.empty:
+        tenant_stats = tenant_stats[tenant_stats['Tenant'] == tenant_id]
+    st.dataframe(tenant_stats, use_container_width=True)
 
 # Apply filters
-filtered_df = df.copy() if not df.empty else pd.DataFrame()
+# The shared frame's data is never copied: all selections are combined into one mask and applied once.
+# The same selection is applied to historical snapshots, so trend answers cover the rows the user is looking at.
+def selection_mask(frame):
+    mask = pd.Series(True, index=frame.index)
+    for col, value in [('Employee_ID', selected_employee), ('Department', selected_department),
+                       ('Job_Title', selected_job), ('Remote_Work_Category', selected_remote)]:
+        if value != "All" and col in frame.columns:
+            mask &= frame[col] == value
+    if len(date_range) == 2 and 'Hire_Date' in frame.columns:
+        mask &= (frame['Hire_Date'] >= pd.to_datetime(date_range[0])) & (frame['Hire_Date'] <= pd.to_datetime(date_range[1]))
+    return mask
+
+def select_rows(frame):
+    mask = selection_mask(frame)
+    return frame if mask.all() else frame[mask]
+
+filtered_df = df.copy(deep=False)
+# Department/job/remote selections map onto sketch cells; employee and hire-date filters narrow rows within cells
+cell_filter = {col: value for col, value in [('Department', selected_department), ('Job_Title', selected_job),
+                                             ('Remote_Work_Category', selected_remote)] if value != "All"}
+rows_narrowed = False
 if not filtered_df.empty:
     try:
-        if selected_employee != "All":
-            filtered_df = filtered_df[filtered_df['Employee_ID'] == selected_employee]
-        if selected_department != "All":
-            filtered_df = filtered_df[filtered_df['Department'] == selected_department]
-        if selected_job != "All":
-            filtered_df = filtered_df[filtered_df['Job_Title'] == selected_job]
-        if selected_remote != "All":
-            filtered_df = filtered_df[filtered_df['Remote_Work_Category'] == selected_remote]
-        if len(date_range) == 2:
-            filtered_df = filtered_df[(filtered_df['Hire_Date'] >= pd.to_datetime(date_range[0])) &
-                                      (filtered_df['Hire_Date'] <= pd.to_datetime(date_range[1]))]
+        rows_narrowed = selected_employee != "All" or (len(date_range) == 2 and not df['Hire_Date'].between(
+            pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])).all())
+        filtered_df = select_rows(filtered_df)
         logger.info(f"Filtered data to {len(filtered_df)} rows.")
     except Exception as e:
         st.error(f"Error applying filters: {str(e)}")
         logger.error(f"Filter error: {str(e)}")
 
+filter_key = (selected_employee, selected_department, selected_job, selected_remote, tuple(str(d) for d in date_range))
+
+sketch_index = tenant.cached('sketches', data_version, lambda previous: SketchIndex(df, previous)) if not df.empty else None
+active_sketches = (sketch_index, cell_filter) if sketch_index is not None and not rows_narrowed else None
+
+def cached_markup(chart_id, build_markup):
+    key = (data_version, filter_key, chart_id)
+    markup = figure_cache.get(key)
+    if markup is None:
+        markup = build_markup()
+        figure_cache.put(key, markup)
+    return markup
+
+def cached_figure(chart_id, build_fig):
+    return pio.from_json(cached_markup(chart_id, lambda: build_fig().to_json()), skip_invalid=True)
+
 # Email Alerts
-st.subheader("Email Notifications")
-if st.button("Send Email Alerts"):
-    low_sat_df = df[df['Satisfaction_Level'] == 'Low'] if not df.empty else pd.DataFrame()
-    low_sat_content = "\n".join([f"Low Satisfaction - EmpID: {row['Employee_ID']}, Dept: {row['Department']}, Job: {row['Job_Title']}" for _, row in low_sat_df.iterrows()]) if not low_sat_df.empty else "None"
-    low_perf_df = df[df['Performance_Level'] == 'Low'] if not df.empty else pd.DataFrame()
-    low_perf_content = "\n".join([f"Low Performance - EmpID: {row['Employee_ID']}, Dept: {row['Department']}, Job: {row['Job_Title']}" for _, row in low_perf_df.iterrows()]) if not low_perf_df.empty else "None"
-    high_ret_df = df[df['Retention_Risk_Level'] == 'High'] if not df.empty else pd.DataFrame()
-    high_ret_content = "\n".join([f"High Retention Risk - EmpID: {row['Employee_ID']}, Dept: {row['Department']}, Job: {row['Job_Title']}" for _, row in high_ret_df.iterrows()]) if not high_ret_df.empty else "None"
-    email_content = f"Employee Alerts:\n\nLow Satisfaction Alerts:\n{low_sat_content}\n\nLow Performance Alerts:\n{low_perf_content}\n\nHigh Retention Risk Alerts:\n{high_ret_content}"
-    if low_sat_content != "None" or low_perf_content != "None" or high_ret_content != "None":
-        try:
-            yag.send(to=receiver_admin_email, subject="🚨 Employee Alerts", contents=email_content)
-            st.success("✅ Admin alert email sent.")
-            logger.info("Email alert sent successfully.")
-        except Exception as e:
-            st.error(f"Failed to send email: {str(e)}")
-            logger.error(f"Email sending error: {str(e)}")
-    else:
-        st.info("ℹ️ No email alerts sent. No employees meet alert criteria.")
+alert_views = tenant.cached('alerts', data_version, lambda previous: AlertViews(df))
 
-# Alert Display Buttons
-col1, col2, col3 = st.columns(3)
-with col1:
-    if st.button("View Low Satisfaction Alerts"):
-        st.write("**Low Satisfaction Alerts**")
-        st.dataframe(low_sat_df[['Employee_ID', 'Department', 'Job_Title']] if 'low_sat_df' in locals() else pd.DataFrame())
-with col2:
-    if st.button("View Low Performance Alerts"):
-        st.write("**Low Performance Alerts**")
-        st.dataframe(low_perf_df[['Employee_ID', 'Department', 'Job_Title']] if 'low_perf_df' in locals() else pd.DataFrame())
-with col3:
-    if st.button("View High Retention Risk Alerts"):
-        st.write("**High Retention Risk Alerts**")
-        st.dataframe(high_ret_df[['Employee_ID', 'Department', 'Job_Title']] if 'high_ret_df' in locals() else pd.DataFrame())
+# Alert panels run as fragments so their buttons rerun only the panel, not the whole dashboard
+@st.fragment
+def render_alert_actions():
+    st.subheader("Email Notifications")
+    if st.button("Send Email Alerts"):
+        if alert_views.has_alerts():
+            try:
+                yag.send(to=receiver_admin_email, subject="🚨 Employee Alerts", contents=alert_views.email_content())
+                st.success("✅ Admin alert email sent.")
+                logger.info("Email alert sent successfully.")
+            except Exception as e:
+                st.error(f"Failed to send email: {str(e)}")
+                logger.error(f"Email sending error: {str(e)}")
+        else:
+            st.info("ℹ️ No email alerts sent. No employees meet alert criteria.")
 
-# KPI Cards
-remote_efficiency_column = next((col for col in df.columns if col.lower().replace(" ", "_") == 'remote_work_efficiency'), None)
-remote_work_efficiency_avg = filtered_df[remote_efficiency_column].mean() if not filtered_df.empty and remote_efficiency_column else 0
-productivity_avg = filtered_df['Productivity score'].mean() if not filtered_df.empty else 0
-avg_salary = filtered_df['Annual Salary'].mean() if 'Annual Salary' in filtered_df.columns and not filtered_df.empty else 0
-num_employees = len(filtered_df)
+    # Alert Display Buttons
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("View Low Satisfaction Alerts"):
+            st.session_state.alert_view = 'low_satisfaction'
+        if st.session_state.get('alert_view') == 'low_satisfaction':
+            st.write("**Low Satisfaction Alerts**")
+            render_paginated(alert_views.view('low_satisfaction'), "alert_view_low_satisfaction")
+    with col2:
+        if st.button("View Low Performance Alerts"):
+            st.session_state.alert_view = 'low_performance'
+        if st.session_state.get('alert_view') == 'low_performance':
+            st.write("**Low Performance Alerts**")
+            render_paginated(alert_views.view('low_performance'), "alert_view_low_performance")
+    with col3:
+        if st.button("View High Retention Risk Alerts"):
+            st.session_state.alert_view = 'high_retention'
+        if st.session_state.get('alert_view') == 'high_retention':
+            st.write("**High Retention Risk Alerts**")
+            render_paginated(alert_views.view('high_retention'), "alert_view_high_retention")
 
-col1, col2, col3, col4 = st.columns(4)
-with col1:
-    st.markdown(f"""
+render_alert_actions()
+
+# KPI Cards
+def kpi_card(title, value):
+    return f"""
         <div style="background-color:black; padding:20px; border-radius:10px">
-            <h3 style="color:white; text-align:center;">Remote Work Efficiency</h3>
-            <h1 style="color:white; text-align:center;">{remote_work_efficiency_avg:.2f}</h1>
+            <h3 style="color:white; text-align:center;">{title}</h3>
+            <h1 style="color:white; text-align:center;">{value}</h1>
         </div>
-    """, unsafe_allow_html=True)
+    """
+
+def build_remote_efficiency_kpi():
+    remote_efficiency_column = next((col for col in df.columns if col.lower().replace(" ", "_") == 'remote_work_efficiency'), None)
+    remote_work_efficiency_avg = filtered_df[remote_efficiency_column].mean() if not filtered_df.empty and remote_efficiency_column else 0
+    return kpi_card("Remote Work Efficiency", f"{remote_work_efficiency_avg:.2f}")
+
+def build_productivity_kpi():
+    productivity_avg = filtered_df['Productivity score'].mean() if not filtered_df.empty else 0
+    return kpi_card("Productivity Score", f"{productivity_avg:.2f}")
+
+def build_salary_kpi():
+    avg_salary = filtered_df['Annual Salary'].mean() if 'Annual Salary' in filtered_df.columns and not filtered_df.empty else 0
+    return kpi_card("Average Annual Salary", f"${avg_salary:,.2f}")
+
+def build_headcount_kpi():
+    return kpi_card("Number of Employees", f"{len(filtered_df)}")
+
+def build_median_salary_kpi():
+    median_info = {'agg_func': 'median', 'agg_column': 'Annual Salary', 'quantile': 0.5, 'group_by': None, 'conditions': []}
+    median_salary = sketch_aggregate(filtered_df, median_info, active_sketches).iloc[0, 0] if 'Annual Salary' in filtered_df.columns and not filtered_df.empty else 0
+    return kpi_card("Median Annual Salary", f"${median_salary:,.2f}")
+
+col1, col2, col3, col4, col5 = st.columns(5)
+with col1:
+    st.markdown(cached_markup('kpi_remote_efficiency', build_remote_efficiency_kpi), unsafe_allow_html=True)
 with col2:
-    st.markdown(f"""
-        <div style="background-color:black; padding:20px; border-radius:10px">
-            <h3 style="color:white; text-align:center;">Productivity Score</h3>
-            <h1 style="color:white; text-align:center;">{productivity_avg:.2f}</h1>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(cached_markup('kpi_productivity', build_productivity_kpi), unsafe_allow_html=True)
 with col3:
-    st.markdown(f"""
-        <div style="background-color:black; padding:20px; border-radius:10px">
-            <h3 style="color:white; text-align:center;">Average Annual Salary</h3>
-            <h1 style="color:white; text-align:center;">${avg_salary:,.2f}</h1>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(cached_markup('kpi_salary', build_salary_kpi), unsafe_allow_html=True)
 with col4:
-    st.markdown(f"""
-        <div style="background-color:black; padding:20px; border-radius:10px">
-            <h3 style="color:white; text-align:center;">Number of Employees</h3>
-            <h1 style="color:white; text-align:center;">{num_employees}</h1>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(cached_markup('kpi_median_salary', build_median_salary_kpi), unsafe_allow_html=True)
+with col5:
+    st.markdown(cached_markup('kpi_headcount', build_headcount_kpi), unsafe_allow_html=True)
+
+# What-If Scenarios
+# Each scenario scales or shifts score columns for a Department/Job_Title scope and can move the level cut
+# points. All scenarios are evaluated together as (scenarios x rows) arrays over zero-copy views of the
+# filtered columns; only the columns a scenario touches are adjusted and re-bucketed, the rest reuse the
+# baseline aggregate.
+SCENARIO_MAX = 8
+SCENARIO_ADJUSTMENTS = {
+    'Salary Change %': ('Annual Salary', 'scale'),
+    'Performance Shift': ('Performance_Score', 'shift'),
+    'Satisfaction Shift': ('Employee_Satisfaction_Score', 'shift'),
+    'Retention Shift': ('Retension risk index', 'shift')
+}
+SCENARIO_LEVEL_NAMES = {'Performance_Level': 'Performance', 'Satisfaction_Level': 'Satisfaction', 'Retention_Risk_Level': 'Retention Risk'}
+SCENARIO_CUTS = {level_col: (f"{name} Low/Medium Cut", f"{name} Medium/High Cut") for level_col, name in SCENARIO_LEVEL_NAMES.items()}
+SCENARIO_AVERAGES = {
+    'Average Annual Salary': 'Annual Salary',
+    'Average Performance Score': 'Performance_Score',
+    'Average Satisfaction Score': 'Employee_Satisfaction_Score',
+    'Average Retention Risk Index': 'Retension risk index'
+}
+
+def default_scenarios():
+    rows = [{'Scenario': 'Baseline'},
+            {'Scenario': 'Engineering +5% salary', 'Department': 'Engineering', 'Salary Change %': 5.0},
+            {'Scenario': 'Retention High cut at 1.2', SCENARIO_CUTS['Retention_Risk_Level'][1]: 1.2}]
+    return normalize_scenarios(pd.DataFrame(rows))
+
+def normalize_scenarios(scenarios):
+    scenarios = scenarios.dropna(how='all').reset_index(drop=True)
+    normalized = pd.DataFrame({'Scenario': scenarios.get('Scenario', pd.Series(dtype=object)).fillna('').astype(str)})
+    normalized['Scenario'] = normalized['Scenario'].where(normalized['Scenario'] != '', [f"Scenario {i + 1}" for i in range(len(normalized))])
+    for col in ['Department', 'Job_Title']:
+        normalized[col] = scenarios[col].fillna('All').astype(str) if col in scenarios else 'All'
+    for col in SCENARIO_ADJUSTMENTS:
+        normalized[col] = pd.to_numeric(scenarios[col], errors='coerce').fillna(0.0) if col in scenarios else 0.0
+    for level_col, (low_col, high_col) in SCENARIO_CUTS.items():
+        default_low, default_high = LEVEL_BUCKETS[level_col][1]
+        normalized[low_col] = pd.to_numeric(scenarios[low_col], errors='coerce').fillna(default_low) if low_col in scenarios else default_low
+        normalized[high_col] = pd.to_numeric(scenarios[high_col], errors='coerce').fillna(default_high) if high_col in scenarios else default_high
+    return normalized
+
+def scenario_scope(frame, scenarios):
+    scope = np.ones((len(scenarios), len(frame)), dtype=bool)
+    for col in ['Department', 'Job_Title']:
+        targets = scenarios[col].to_numpy()
+        applies = targets != 'All'
+        if col not in frame.columns or not applies.any():
+            continue
+        codes, uniques = pd.factorize(frame[col])
+        target_codes = pd.Index(uniques).get_indexer(targets)
+        target_codes[target_codes == -1] = -2  # unknown values must not match the -1 code of missing cells
+        scope &= ~applies[:, None] | (codes[None, :] == target_codes[:, None])
+    return scope
+
+def evaluate_scenarios(frame, scenarios):
+    started = time.perf_counter()
+    count = len(scenarios)
+    scope = scenario_scope(frame, scenarios)
+    # Adjusted values are (scenarios x rows); untouched columns stay as a (1 x rows) view of the frame
+    values = {}
+    for adjustment, (col, kind) in SCENARIO_ADJUSTMENTS.items():
+        if col not in frame.columns:
+            continue
+        base = frame[col].to_numpy(dtype=float)[None, :]
+        amounts = scenarios[adjustment].to_numpy(dtype=float)
+        if not amounts.any():
+            values[col] = base
+            continue
+        delta = np.where(scope, amounts[:, None], 0.0)
+        values[col] = base * (1 + delta / 100) if kind == 'scale' else base + delta
+    results = {}
+    for label, col in SCENARIO_AVERAGES.items():
+        if col in values:
+            results[label] = np.broadcast_to(np.nanmean(values[col], axis=1), count)
+    if 'Annual Salary' in values:
+        results['Total Annual Salary'] = np.broadcast_to(np.nansum(values['Annual Salary'], axis=1), count)
+    for level_col, (score_col, default_cuts) in LEVEL_BUCKETS.items():
+        if score_col not in values:
+            continue
+        cuts = np.sort(scenarios[list(SCENARIO_CUTS[level_col])].to_numpy(dtype=float), axis=1)
+        score = values[score_col]
+        if score.shape[0] == 1 and np.allclose(cuts, default_cuts) and level_col in frame.columns:
+            # Neither the scores nor the cut points moved: reuse the existing buckets
+            level_counts = frame[level_col].value_counts()
+            counts = {label: np.full(count, int(level_counts.get(label, 0))) for label in LEVEL_LABELS}
+        else:
+            # Same right-closed buckets as pd.cut: Low <= low cut < Medium <= high cut < High
+            buckets = (score > cuts[:, :1]).astype(np.int8) + (score > cuts[:, 1:])
+            buckets[np.broadcast_to(np.isnan(score), buckets.shape)] = -1
+            counts = {label: (buckets == i).sum(axis=1) for i, label in enumerate(LEVEL_LABELS)}
+        for label in LEVEL_LABELS:
+            results[f"{label} {SCENARIO_LEVEL_NAMES[level_col]}"] = counts[label]
+    adjusts = scenarios[list(SCENARIO_ADJUSTMENTS)].to_numpy(dtype=float).any(axis=1)
+    results['Employees Adjusted'] = np.where(adjusts, scope.sum(axis=1), 0)
+    logger.info(f"Evaluated {count} what-if scenarios over {len(frame)} rows in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    return pd.DataFrame(results, index=scenarios['Scenario'].to_numpy())
+
+@st.fragment
+def render_what_if(frame):
+    with st.expander("What-If Scenarios"):
+        st.caption(f"Adjust salaries, scores and level cut points for the current filter. Up to {SCENARIO_MAX} scenarios; "
+                   "the first row is the reference the others are compared against.")
+        edited = st.data_editor(
+            default_scenarios(), num_rows="dynamic", hide_index=True, use_container_width=True, key="what_if_scenarios",
+            column_config={
+                'Department': st.column_config.SelectboxColumn(options=["All"] + departments),
+                'Job_Title': st.column_config.SelectboxColumn(options=["All"] + job_titles)
+            }
+        )
+        scenarios = normalize_scenarios(edited).head(SCENARIO_MAX)
+        if frame.empty or scenarios.empty:
+            st.info("No employees or scenarios to evaluate.")
+            return
+        results = evaluate_scenarios(frame, scenarios)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**Scenario KPIs**")
+            st.dataframe(results.T.round(2), use_container_width=True)
+        with col2:
+            st.markdown(f"**Change vs {results.index[0]}**")
+            st.dataframe((results - results.iloc[0]).T.round(2), use_container_width=True)
+
+render_what_if(filtered_df)
 
 # Visual Analytics
+def build_remote_efficiency_chart():
+    remote_efficiency = filtered_df.groupby(['Department', 'Remote_Work_Category'])['Productivity score'].mean().reset_index() if not filtered_df.empty else pd.DataFrame()
+    return px.bar(remote_efficiency, x='Department', y='Productivity score', color='Remote_Work_Category',
+                  barmode='group', color_discrete_map={'Work From Home': '#2B7A78', 'Work From Office': '#333333', 'Hybrid': '#228B22'}) if not remote_efficiency.empty else px.bar()
+
+def build_performance_treemap():
+    tree_data = filtered_df.groupby(['Job_Title', 'Performance_Level'])['Employee_ID'].count().reset_index() if not filtered_df.empty else pd.DataFrame()
+    if tree_data.empty:
+        return px.treemap()
+    tree_data.rename(columns={'Employee_ID': 'Number_of_Employees'}, inplace=True)
+    # Force the level columns to plain strings so NaN becomes a placeholder category
+    tree_data['Job_Title'] = tree_data['Job_Title'].astype(str).replace('nan', 'Unknown Job Title')
+    tree_data['Performance_Level'] = tree_data['Performance_Level'].astype(str).replace('nan', 'Unknown')
+    color_map = {
+        'Low': '#FF4040',
+        'Medium': '#FFA500',
+        'High': '#228B22',
+        'Unknown': '#808080'  # Grey for unknown data
+    }
+    return px.treemap(
+        tree_data,
+        path=['Job_Title', 'Performance_Level'],
+        values='Number_of_Employees',
+        color='Performance_Level',
+        color_discrete_map=color_map
+    )
+
+def build_retention_chart():
+    retention_count = filtered_df.groupby(['Job_Title', 'Retention_Risk_Level'])['Employee_ID'].count().reset_index() if not filtered_df.empty else pd.DataFrame()
+    retention_count.rename(columns={'Employee_ID': 'Number_of_Employees'}, inplace=True)
+    return px.bar(retention_count, x='Job_Title', y='Number_of_Employees', color='Retention_Risk_Level',
+                  color_discrete_map={'Low': '#8B0000', 'Medium': '#FFA500', 'High': '#006400'}) if not retention_count.empty else px.bar()
+
+def build_remote_pie():
+    remote_data = filtered_df['Remote_Work_Category'].value_counts().reset_index() if not filtered_df.empty else pd.DataFrame()
+    if remote_data.empty:
+        return px.pie()
+    remote_data.columns = ['Remote_Work_Category', 'Count']
+    return px.pie(remote_data, names='Remote_Work_Category', values='Count',
+                  color_discrete_map={'Work From Home': '#2B7A78', 'Work From Office': '#333333', 'Hybrid': '#228B22'})
+
+def build_satisfaction_chart():
+    sat_avg = filtered_df.groupby('Department')['Employee_Satisfaction_Score'].mean().reset_index() if not filtered_df.empty else pd.DataFrame()
+    return px.bar(sat_avg, x='Department', y='Employee_Satisfaction_Score',
+                  color='Department', color_discrete_sequence=px.colors.qualitative.Plotly) if not sat_avg.empty else px.bar()
+
+def build_trend_chart():
+    if filtered_df.empty:
+        return px.line()
+    years_bin = pd.cut(filtered_df['Years_At_Company'], bins=10).apply(lambda x: x.mid).rename('Years_Bin')
+    trend_data = filtered_df.groupby([years_bin, 'Job_Title'])['Performance_Score'].mean().reset_index()
+    return px.line(trend_data, x='Years_Bin', y='Performance_Score', color='Job_Title') if not trend_data.empty else px.line()
+
 st.subheader("Visual Analytics")
 row1_col1, row1_col2, row1_col3 = st.columns(3)
 with row1_col1:
     st.markdown("**Remote Work Efficiency by Department**")
-    remote_efficiency = filtered_df.groupby(['Department', 'Remote_Work_Category'])['Productivity score'].mean().reset_index() if not filtered_df.empty else pd.DataFrame()
-    fig_remote = px.bar(remote_efficiency, x='Department', y='Productivity score', color='Remote_Work_Category',
-                        barmode='group', color_discrete_map={'Work From Home': '#2B7A78', 'Work From Office': '#333333', 'Hybrid': '#228B22'}) if not remote_efficiency.empty else px.bar()
-    st.plotly_chart(fig_remote, use_container_width=True)
+    st.plotly_chart(cached_figure('remote_efficiency', build_remote_efficiency_chart), use_container_width=True, key='chart_remote_efficiency')
 with row1_col2:
     st.markdown("**Performance Level Distribution by Job Title**")
-    tree_data = filtered_df.groupby(['Job_Title', 'Performance_Level'])['Employee_ID'].count().reset_index() if not filtered_df.empty else pd.DataFrame()
-    tree_data.rename(columns={'Employee_ID': 'Number_of_Employees'}, inplace=True)
-    # ... (Your code *before* line 909) ...
-# --- START: Replace your previous fix with this code ---
-
-# 1. Create a copy to avoid modifying the original dataframe
-tree_data_copy = tree_data.copy()
-
-# 2. Force the columns to be 'str' type FIRST.
-# This is the key change. It converts the column to simple strings
-# and turns any NaN values into the string 'nan'.
-tree_data_copy['Job_Title'] = tree_data_copy['Job_Title'].astype(str)
-tree_data_copy['Performance_Level'] = tree_data_copy['Performance_Level'].astype(str)
-
-# 3. Now that they are strings, replace the 'nan' strings with your desired placeholder.
-tree_data_copy['Job_Title'] = tree_data_copy['Job_Title'].replace('nan', 'Unknown Job Title')
-tree_data_copy['Performance_Level'] = tree_data_copy['Performance_Level'].replace('nan', 'Unknown')
-
-# 4. Update your color map to handle the new 'Unknown' category
-color_map = {
-    'Low': '#FF4040', 
-    'Medium': '#FFA500', 
-    'High': '#228B22',
-    'Unknown': '#808080'  # Add a grey color for unknown data
-}
-# --- END: New recommended solution ---
-
-
-# --- This is your MODIFIED original treemap line ---
-# (Make sure this line is NOT indented)
-fig_tree = px.treemap(
-    tree_data_copy,  # Use the cleaned copy
-    path=['Job_Title', 'Performance_Level'], 
-    values='Number_of_Employees',
-    color='Performance_Level',
-    color_discrete_map=color_map # Use the updated color map
-) if not tree_data_copy.empty else px.treemap()
-st.plotly_chart(fig_tree, use_container_width=True)
+    st.plotly_chart(cached_figure('performance_treemap', build_performance_treemap), use_container_width=True, key='chart_performance_treemap')
 with row1_col3:
     st.markdown("**Employee Count by Retention Risk Level and Job Title**")
-    retention_count = filtered_df.groupby(['Job_Title', 'Retention_Risk_Level'])['Employee_ID'].count().reset_index() if not filtered_df.empty else pd.DataFrame()
-    retention_count.rename(columns={'Employee_ID': 'Number_of_Employees'}, inplace=True)
-    fig_ret = px.bar(retention_count, x='Job_Title', y='Number_of_Employees', color='Retention_Risk_Level',
-                     color_discrete_map={'Low': '#8B0000', 'Medium': '#FFA500', 'High': '#006400'}) if not retention_count.empty else px.bar()
-    st.plotly_chart(fig_ret, use_container_width=True)
+    st.plotly_chart(cached_figure('retention_bar', build_retention_chart), use_container_width=True, key='chart_retention_bar')
 
 row2_col1, row2_col2, row2_col3 = st.columns(3)
 with row2_col1:
     st.markdown("**Remote Work Type Distribution**")
-    remote_data = filtered_df['Remote_Work_Category'].value_counts().reset_index() if not filtered_df.empty else pd.DataFrame()
-    remote_data.columns = ['Remote_Work_Category', 'Count']
-    fig_pie = px.pie(remote_data, names='Remote_Work_Category', values='Count',
-                     color_discrete_map={'Work From Home': '#2B7A78', 'Work From Office': '#333333', 'Hybrid': '#228B22'}) if not remote_data.empty else px.pie()
-    st.plotly_chart(fig_pie, use_container_width=True)
+    st.plotly_chart(cached_figure('remote_pie', build_remote_pie), use_container_width=True, key='chart_remote_pie')
 with row2_col2:
     st.markdown("**Average Satisfaction by Department**")
-    sat_avg = filtered_df.groupby('Department')['Employee_Satisfaction_Score'].mean().reset_index() if not filtered_df.empty else pd.DataFrame()
-    fig_sat = px.bar(sat_avg, x='Department', y='Employee_Satisfaction_Score',
-                     color='Department', color_discrete_sequence=px.colors.qualitative.Plotly) if not sat_avg.empty else px.bar()
-    st.plotly_chart(fig_sat, use_container_width=True)
+    st.plotly_chart(cached_figure('satisfaction_bar', build_satisfaction_chart), use_container_width=True, key='chart_satisfaction_bar')
 with row2_col3:
     st.markdown("**Performance Trend by Years at Company**")
-    filtered_df['Years_Bin'] = pd.cut(filtered_df['Years_At_Company'], bins=10).apply(lambda x: x.mid) if not filtered_df.empty else pd.Series()
-    trend_data = filtered_df.groupby(['Years_Bin', 'Job_Title'])['Performance_Score'].mean().reset_index() if not filtered_df.empty else pd.DataFrame()
-    fig_line = px.line(trend_data, x='Years_Bin', y='Performance_Score', color='Job_Title') if not trend_data.empty else px.line()
-    st.plotly_chart(fig_line, use_container_width=True)
+    st.plotly_chart(cached_figure('performance_trend', build_trend_chart), use_container_width=True, key='chart_performance_trend')
 
 # Data Alert Tables
-st.subheader("Data Alerts")
-alert_dept = st.selectbox("Filter Alerts by Department", ["All"] + departments, key="alert_dept")
-alert_job = st.selectbox("Filter Alerts by Job Title", ["All"] + job_titles, key="alert_job")
-low_sat_alert_df = df[df['Satisfaction_Level'] == 'Low'][['Employee_ID', 'Department', 'Job_Title']] if not df.empty else pd.DataFrame()
-high_ret_alert_df = df[df['Retention_Risk_Level'] == 'High'][['Employee_ID', 'Department', 'Job_Title']] if not df.empty else pd.DataFrame()
-if alert_dept != "All":
-    low_sat_alert_df = low_sat_alert_df[low_sat_alert_df['Department'] == alert_dept] if not low_sat_alert_df.empty else pd.DataFrame()
-    high_ret_alert_df = high_ret_alert_df[high_ret_alert_df['Department'] == alert_dept] if not high_ret_alert_df.empty else pd.DataFrame()
-if alert_job != "All":
-    low_sat_alert_df = low_sat_alert_df[low_sat_alert_df['Job_Title'] == alert_job] if not low_sat_alert_df.empty else pd.DataFrame()
-    high_ret_alert_df = high_ret_alert_df[high_ret_alert_df['Job_Title'] == alert_job] if not high_ret_alert_df.empty else pd.DataFrame()
-col1, col2 = st.columns(2)
-with col1:
-    st.markdown("**Low Satisfaction Alerts**")
-    st.dataframe(low_sat_alert_df, use_container_width=True)
-with col2:
-    st.markdown("**High Retention Risk Alerts**")
-    st.dataframe(high_ret_alert_df, use_container_width=True)
+@st.fragment
+def render_data_alerts():
+    st.subheader("Data Alerts")
+    alert_dept = st.selectbox("Filter Alerts by Department", ["All"] + departments, key="alert_dept")
+    alert_job = st.selectbox("Filter Alerts by Job Title", ["All"] + job_titles, key="alert_job")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Low Satisfaction Alerts**")
+        render_paginated(alert_views.view('low_satisfaction', alert_dept, alert_job), "data_alert_low_satisfaction", use_container_width=True)
+    with col2:
+        st.markdown("**High Retention Risk Alerts**")
+        render_paginated(alert_views.view('high_retention', alert_dept, alert_job), "data_alert_high_retention", use_container_width=True)
+
+render_data_alerts()
 
 # Chatbot Section
-st.subheader("Chatbot")
-st.markdown("Ask about employee details (e.g., 'Employee 123', 'Employee ID with salary > 90000', 'Average salary for analyst'), greetings (e.g., 'Hello', 'Good morning'), or general questions (e.g., 'What's the time?', 'Tell me a joke').")
-# Display chat history in a container
-st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-for chat in st.session_state.chat_history:
-    if chat['role'] == 'user':
-        st.markdown(f"<div class='chat-message user-message'>{chat['message']}</div>", unsafe_allow_html=True)
-    else:
-        st.markdown(f"<div class='chat-message bot-message'>{chat['message']}</div>", unsafe_allow_html=True)
-st.markdown('</div>', unsafe_allow_html=True)
-
-user_input = st.text_input("Type your question:", key="chat_input")
-if user_input:
-    st.session_state.chat_history.append({"role": "user", "message": user_input})
-    columns = df.columns.tolist() if not df.empty else []
-    response, query_info, result_df, chart_type = get_chatbot_response(user_input, filtered_df, columns)
-    
-    # Show visualization choice if query produced a result_df
-    if result_df is not None and not result_df.empty and 'Error' not in result_df.columns and 'Message' not in result_df.columns:
-        st.markdown("Would you like a visualization for this result?")
-        visualization_choice = st.radio(
-            "Select an option:",
-            ["Yes", "No"],
-            key=f"vis_choice_{user_input}",
-            index=0
-        )
-        st.session_state.visualization_choice = visualization_choice
+# Chat turns and visualization choices rerun only this fragment; the sheet load, filters and charts above are untouched
+@st.fragment
+def render_chatbot(filtered_df, columns):
+    st.subheader("Chatbot")
+    st.markdown("Ask about employee details (e.g., 'Employee 123', 'Employee ID with salary > 90000', 'Average salary for analyst'), greetings (e.g., 'Hello', 'Good morning'), or general questions (e.g., 'What's the time?', 'Tell me a joke').")
+    # Display chat history in a container
+    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    history = st.session_state.chat_history
+    page_count = max(1, -(-len(history) // CHAT_PAGE_SIZE))
+    page = st.number_input("Chat history page (1 = latest)", min_value=1, max_value=page_count, value=1, key="chat_page") if page_count > 1 else 1
+    for chat in history.page(int(page) - 1, CHAT_PAGE_SIZE):
+        if chat['role'] == 'user':
+            st.markdown(f"<div class='chat-message user-message'>{chat['message']}</div>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"<div class='chat-message bot-message'>{chat['message']}</div>", unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    user_input = st.text_input("Type your question:", key="chat_input")
+    suggestions = chat_suggestions(user_input) if user_input else []
+    if suggestions:
+        st.caption("Suggestions")
+        for i, (col, suggestion) in enumerate(zip(st.columns(len(suggestions)), suggestions)):
+            with col:
+                st.button(suggestion, key=f"chat_suggestion_{i}", on_click=use_chat_suggestion, args=(suggestion,))
+    if not user_input:
+        st.session_state.chat_turn = None
+    turn = st.session_state.chat_turn
+    turn_key = (user_input, data_version, filter_key)
+    if user_input and (turn is None or turn['key'] != turn_key):
+        # A submitted input is answered once per data version and sidebar selection; page flips and chart
+        # choices rerun the fragment with the same key and reuse the stored answer
+        st.session_state.chat_history.append({"role": "user", "message": user_input})
+        st.session_state.pop("chat_result_page", None)
+        turn_start = time.perf_counter()
+        response, query_info, result_df, chart_type = get_chatbot_response(user_input, filtered_df, columns)
+        logger.info(f"Chat turn latency: {(time.perf_counter() - turn_start) * 1000:.1f} ms")
+        turn = {'key': turn_key, 'input': user_input, 'query_info': query_info, 'chart_type': chart_type,
+                'has_result': result_df is not None, 'declined': False}
+        st.session_state.chat_turn = turn
+
+    if user_input and turn['has_result']:
+        # Pages are rendered from the stored result, not by answering the question again
+        query_info, chart_type = turn['query_info'], turn['chart_type']
+        result = st.session_state.result_store.view(st.session_state.conversation_context.last_result_id)
+        if result is not None:
+            render_paginated(result, "chat_result")
+        # A spilled result is only read a page at a time, so it is offered as a download rather than charted
+        result_df = result if isinstance(result, pd.DataFrame) else None
+        if isinstance(result, SpilledResult):
+            st.caption("This result is too large to chart here; download it to explore it in full.")
+
+        # Show visualization choice if query produced a result_df
+        if result_df is not None and not result_df.empty and 'Error' not in result_df.columns and 'Message' not in result_df.columns:
+            st.markdown("Would you like a visualization for this result?")
+            visualization_choice = st.radio(
+                "Select an option:",
+                ["Yes", "No"],
+                key=f"vis_choice_{user_input}",
+                index=0
+            )
+            st.session_state.visualization_choice = visualization_choice
         
-        if visualization_choice == "No":
-            st.session_state.chat_history.append({"role": "bot", "message": "Thank you for saving our efforts"})
-            st.markdown("<div class='chat-message bot-message'>Thank you for saving our efforts</div>", unsafe_allow_html=True)
-        elif visualization_choice == "Yes":
-            if chart_type != 'table' or query_info['operation'] in ['list_unique', 'count_value', 'group_aggregate', 'aggregate', 'group_top']:
-                if query_info['operation'] == 'list_unique':
-                    list_col = query_info.get('list_column')
-                    if chart_type == 'pie_chart':
-                        fig = px.pie(result_df, names=list_col, title=f"Distribution of {list_col}",
-                                     color_discrete_sequence=px.colors.qualitative.Plotly)
-                    elif chart_type == 'donut_chart':
-                        fig = px.pie(result_df, names=list_col, title=f"Distribution of {list_col}", hole=0.4,
-                                     color_discrete_sequence=px.colors.qualitative.Plotly)
-                    else:
-                        fig = px.bar(result_df, x=list_col, title=f"Unique {list_col}", color_discrete_sequence=['#2B7A78'])
-                    st.plotly_chart(fig, use_container_width=True)
+            if visualization_choice == "No":
+                if not turn['declined']:
+                    turn['declined'] = True
+                    st.session_state.chat_history.append({"role": "bot", "message": "Thank you for saving our efforts"})
+                st.markdown("<div class='chat-message bot-message'>Thank you for saving our efforts</div>", unsafe_allow_html=True)
+            elif visualization_choice == "Yes":
+                if chart_type != 'table' or query_info['operation'] in ['list_unique', 'count_value', 'count', 'group_aggregate', 'aggregate', 'group_top']:
+                    if query_info['operation'] == 'list_unique':
+                        list_col = query_info.get('list_column')
+                        if chart_type == 'pie_chart':
+                            fig = px.pie(result_df, names=list_col, title=f"Distribution of {list_col}",
+                                         color_discrete_sequence=px.colors.qualitative.Plotly)
+                        elif chart_type == 'donut_chart':
+                            fig = px.pie(result_df, names=list_col, title=f"Distribution of {list_col}", hole=0.4,
+                                         color_discrete_sequence=px.colors.qualitative.Plotly)
+                        else:
+                            fig = px.bar(result_df, x=list_col, title=f"Unique {list_col}", color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
                 
-                elif query_info['operation'] == 'count_value':
-                    agg_col = query_info.get('agg_column')
-                    count_val = query_info.get('count_value')
-                    fig = px.bar(result_df, x=f"count({count_val})", title=f"Count of {count_val}", color_discrete_sequence=['#2B7A78'])
-                    st.plotly_chart(fig, use_container_width=True)
+                    elif query_info['operation'] == 'count_value':
+                        agg_col = query_info.get('agg_column')
+                        count_val = query_info.get('count_value')
+                        fig = px.bar(result_df, x=f"count({count_val})", title=f"Count of {count_val}", color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
                 
-                elif query_info['operation'] == 'group_aggregate':
-                    group_col = query_info.get('group_by')
-                    if chart_type == 'pie_chart':
-                        fig = px.pie(result_df, names=group_col, values='Count', title=f"Count by {group_col}",
-                                     color_discrete_sequence=px.colors.qualitative.Plotly)
-                    elif chart_type == 'donut_chart':
-                        fig = px.pie(result_df, names=group_col, values='Count', title=f"Count by {group_col}", hole=0.4,
-                                     color_discrete_sequence=px.colors.qualitative.Plotly)
-                    elif chart_type == 'treemap':
-                        fig = px.treemap(result_df, path=[group_col], values='Count', title=f"Count by {group_col}",
+                    elif query_info['operation'] == 'count':
+                        fig = px.bar(result_df, x="count(employees)", title="Count of employees", color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
+
+                    elif query_info['operation'] == 'group_aggregate':
+                        group_col = query_info.get('group_by')
+                        value_col = result_df.columns[1]
+                        if chart_type == 'pie_chart':
+                            fig = px.pie(result_df, names=group_col, values=value_col, title=f"{value_col} by {group_col}",
                                          color_discrete_sequence=px.colors.qualitative.Plotly)
-                    else:
-                        fig = px.bar(result_df, x=group_col, y='Count', title=f"Count by {group_col}", color_discrete_sequence=['#2B7A78'])
-                    st.plotly_chart(fig, use_container_width=True)
+                        elif chart_type == 'donut_chart':
+                            fig = px.pie(result_df, names=group_col, values=value_col, title=f"{value_col} by {group_col}", hole=0.4,
+                                         color_discrete_sequence=px.colors.qualitative.Plotly)
+                        elif chart_type == 'treemap':
+                            fig = px.treemap(result_df, path=[group_col], values=value_col, title=f"{value_col} by {group_col}",
+                                             color_discrete_sequence=px.colors.qualitative.Plotly)
+                        else:
+                            fig = px.bar(result_df, x=group_col, y=value_col, title=f"{value_col} by {group_col}", color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
                 
-                elif query_info['operation'] == 'aggregate':
-                    agg_col = query_info.get('agg_column')
-                    agg_func = query_info.get('agg_func')
-                    fig = px.bar(result_df, x=f"{agg_func}({agg_col})", title=f"{agg_func.capitalize()} of {agg_col}",
-                                 color_discrete_sequence=['#2B7A78'])
-                    st.plotly_chart(fig, use_container_width=True)
+                    elif query_info['operation'] == 'aggregate':
+                        agg_col = query_info.get('agg_column')
+                        agg_func = query_info.get('agg_func')
+                        fig = px.bar(result_df, x=f"{agg_func}({agg_col})", title=f"{agg_func.capitalize()} of {agg_col}",
+                                     color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
                 
-                elif query_info['operation'] == 'group_top':
-                    group_col = query_info.get('group_by')
-                    sort_col = query_info.get('sort_column')
-                    fig = px.bar(result_df, x='Department', y=sort_col, color='Job_Title',
-                                 title=f"Top Employees by {sort_col} per Department")
-                    st.plotly_chart(fig, use_container_width=True)
+                    elif query_info['operation'] == 'group_top':
+                        group_col = query_info.get('group_by')
+                        sort_col = query_info.get('sort_column')
+                        fig = px.bar(result_df, x='Department', y=sort_col, color='Job_Title',
+                                     title=f"Top Employees by {sort_col} per Department")
+                        st.plotly_chart(fig, use_container_width=True)
+
+                    elif query_info['operation'] == 'trend':
+                        trend_col = query_info.get('trend_column')
+                        fig = px.line(result_df, x='Snapshot', y=trend_col, markers=True, title=f"{trend_col} over time",
+                                      color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
                 
-                else:
-                    if chart_type == 'bar_chart' and 'Job_Title' in result_df.columns and 'Annual Salary' in result_df.columns:
-                        fig = px.bar(result_df, x='Employee_ID', y='Annual Salary', color='Job_Title',
-                                     title="Employees Matching Criteria by Salary")
-                    elif chart_type == 'histogram' and any(col in result_df.columns for col in ['Annual Salary', 'Performance_Score', 'Overtime_Hours', 'Number_of_Projects']):
-                        num_col = next(col for col in ['Annual Salary', 'Performance_Score', 'Overtime_Hours', 'Number_of_Projects'] if col in result_df.columns)
-                        fig = px.histogram(result_df, x=num_col, title=f"Distribution of {num_col}",
-                                           color_discrete_sequence=['#2B7A78'])
-                    elif chart_type == 'scatter_plot' and len([col for col in result_df.columns if col in ['Performance_Score', 'Employee_Satisfaction_Score', 'Annual Salary', 'Years_At_Company', 'Number_of_Projects', 'Overtime_Hours']]) >= 2:
-                        num_cols = [col for col in ['Performance_Score', 'Employee_Satisfaction_Score', 'Annual Salary', 'Years_At_Company', 'Number_of_Projects', 'Overtime_Hours'] if col in result_df.columns]
-                        fig = px.scatter(result_df, x=num_cols[0], y=num_cols[1], color='Job_Title',
-                                         title=f"{num_cols[0]} vs {num_cols[1]}")
                     else:
-                        fig = px.bar(result_df, x='Employee_ID', y=result_df.columns[1], title="Employee Data",
-                                     color_discrete_sequence=['#2B7A78'])
-                    st.plotly_chart(fig, use_container_width=True)
+                        if chart_type == 'bar_chart' and 'Job_Title' in result_df.columns and 'Annual Salary' in result_df.columns:
+                            fig = px.bar(result_df, x='Employee_ID', y='Annual Salary', color='Job_Title',
+                                         title="Employees Matching Criteria by Salary")
+                        elif chart_type == 'histogram' and any(col in result_df.columns for col in ['Annual Salary', 'Performance_Score', 'Overtime_Hours', 'Number_of_Projects']):
+                            num_col = next(col for col in ['Annual Salary', 'Performance_Score', 'Overtime_Hours', 'Number_of_Projects'] if col in result_df.columns)
+                            fig = px.histogram(result_df, x=num_col, title=f"Distribution of {num_col}",
+                                               color_discrete_sequence=['#2B7A78'])
+                        elif chart_type == 'scatter_plot' and len([col for col in result_df.columns if col in ['Performance_Score', 'Employee_Satisfaction_Score', 'Annual Salary', 'Years_At_Company', 'Number_of_Projects', 'Overtime_Hours']]) >= 2:
+                            num_cols = [col for col in ['Performance_Score', 'Employee_Satisfaction_Score', 'Annual Salary', 'Years_At_Company', 'Number_of_Projects', 'Overtime_Hours'] if col in result_df.columns]
+                            fig = px.scatter(result_df, x=num_cols[0], y=num_cols[1], color='Job_Title' if 'Job_Title' in result_df.columns else None,
+                                             title=f"{num_cols[0]} vs {num_cols[1]}")
+                        else:
+                            fig = px.bar(result_df, x='Employee_ID', y=result_df.columns[1], title="Employee Data",
+                                         color_discrete_sequence=['#2B7A78'])
+                        st.plotly_chart(fig, use_container_width=True)
+
+render_chatbot(filtered_df, df.columns.tolist() if not df.empty else [])
+
+# Rerun the page only when the background refresher has published a newer dataset version
+@st.fragment(run_every=VERSION_CHECK_SECONDS)
+def watch_dataset_version(displayed_version):
+    # Reads the published dataset without loading it, so an open tab never brings an evicted tenant back;
+    # the next page interaction reloads it through tenant_registry.get(), which enforces the memory budget
+    current = tenant.store.current
+    if current is not None and current.version != displayed_version:
+        st.rerun()
 
-# Auto-refresh every 5 minutes
-st_autorefresh(interval=5 * 60 * 1000, key="data_refresh")
+watch_dataset_version(data_version)
@@ -0,0 +1,281 @@
+# Concurrent-session load test for the Employee Insights Dashboard.
+# Serves a synthetic employee CSV over a local HTTP server in place of the Google Sheet, drives N headless
+# sessions of final_two.py through Streamlit's AppTest, and replays a weighted mix of sidebar changes,
+# employee lookups, chat intents and parse_query operation types. Chat samples are labelled with the operation
+# the app actually parsed (read back from the session's chat turn), and a fallback "Sorry" reply counts as a
+# failure. Reports p50/p95/p99 latency and process RSS per operation so capacity regressions show up between runs.
+#
+# AppTest installs a process-global mock runtime for the duration of each run, so runs from different sessions
+# are serialized on a lock. Sessions still share the app's cache_resource state like they would on one server
+# process, and the reported latency includes the time a request waits for the lock, which is the queueing delay
+# a single GIL-bound server adds as concurrent sessions grow; service_p50_ms is the run time alone.
+#
+# A comma list of session counts runs one round per count and ends with a table of RSS against session count.
+# rss_per_session_mb is the peak above the RSS after a warm-up page load (imports plus the shared dataset), divided
+# by the session count. Freed memory is not always returned to the OS, so later rounds start from the earlier peak.
+#
+#   python load_test.py --sessions 8 --iterations 25 --rows 50000
+#   python load_test.py --sessions 1,2,4,8,16 --iterations 10 --rows 50000
+#
+# Last sweep with the second command (50,000 rows, 283 MB after the warm-up, no errors in 341 operations):
+#
+#   sessions  rss_max_mb  rss_per_session_mb  p50_ms
+#          1       310.2                27.1     399
+#          2       318.8                17.8    1138
+#          4       367.2                21.0    1882
+#          8       385.2                12.8    3584
+#         16       410.4                 8.0    7936
+#
+# Sixteen times the sessions adds about 100 MB on top of the shared 283 MB, so memory grows far slower than the
+# session count; latency grows linearly because runs are serialized as described above.
+import argparse
+import functools
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "final_two.py")
+APP_TIMEOUT_SECONDS = 300
+DEPARTMENTS = ['Sales', 'IT', 'HR', 'Engineering', 'Finance']
+JOB_TITLES = ['Analyst', 'Engineer', 'Manager', 'Specialist', 'Consultant']
+
+# (operation, weight, chat query or None); chat queries are grouped by the parse_query operation they are expected
+# to exercise, but samples are reported under the operation the app parsed
+OPERATION_MIX = [
+    ('sidebar_department', 10, None),
+    ('sidebar_job_title', 5, None),
+    ('employee_lookup', 10, None),
+    ('intent', 5, "Hello"),
+    ('intent', 3, "Tell me a joke"),
+    ('employee_detail', 8, "Employee 123"),
+    ('aggregate', 10, "Average salary for analyst"),
+    ('aggregate', 5, "Median salary"),
+    ('group_aggregate', 5, "Average salary by department"),
+    ('group_aggregate', 3, "How many employees in each department"),
+    ('group_top', 6, "Top 3 employees by salary in each department"),
+    ('sort', 6, "Top 10 employees by performance score"),
+    ('list_unique', 6, "List departments"),
+    ('count_value', 6, "How many females"),
+    ('count_value', 4, "How many employees with low satisfaction level"),
+    ('filter', 8, "Employee ID with salary > 90000 and age < 40")
+]
+FALLBACK_REPLY_PREFIX = "Sorry"
+
+def generate_employee_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'Employee_ID': np.arange(1, rows + 1),
+        'Department': rng.choice(DEPARTMENTS, rows),
+        'Gender': rng.choice(['Male', 'Female'], rows),
+        'Age': rng.integers(21, 60, rows),
+        'Job_Title': rng.choice(JOB_TITLES, rows),
+        'Hire_Date': pd.to_datetime('2012-01-01') + pd.to_timedelta(rng.integers(0, 4000, rows), unit='D'),
+        'Performance_Score': rng.uniform(1, 5, rows).round(2),
+        'Employee_Satisfaction_Score': rng.uniform(1, 5, rows).round(2),
+        'Productivity score': rng.uniform(0, 100, rows).round(1),
+        'Retension risk index': rng.uniform(0, 2, rows).round(2),
+        'Remote_Work_Frequency': rng.choice([0, 25, 50, 75, 100], rows),
+        'Remote Work Efficiency': rng.uniform(0, 10, rows).round(2),
+        'Annual Salary': ['$' + f"{v:,.0f}" for v in rng.uniform(40000, 150000, rows)],
+        'Number_of_Projects': rng.integers(1, 10, rows),
+        'Overtime_Hours': rng.integers(0, 30, rows)
+    }).to_csv(path, index=False)
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def serve_directory(directory):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def current_rss_bytes():
+    # Current resident set size from /proc where available, otherwise the peak reported by getrusage
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def widget(widgets, label=None, key=None):
+    return next(w for w in widgets if (key is not None and w.key == key) or (label is not None and w.label == label))
+
+def perform(app, operation, query, rng, max_employee_id, run):
+    if operation == 'page_load':
+        run(app)
+    elif operation == 'sidebar_department':
+        run(widget(app.selectbox, label="Select Department").select(rng.choice(["All"] + DEPARTMENTS)))
+    elif operation == 'sidebar_job_title':
+        run(widget(app.selectbox, label="Select Job Title").select(rng.choice(["All"] + JOB_TITLES)))
+    elif operation == 'employee_lookup':
+        employee_id = str(rng.randint(1, max_employee_id))
+        run(widget(app.text_input, key="employee_search").input(employee_id[:max(1, len(employee_id) - 1)]))
+        picker = widget(app.selectbox, key="selected_employee")
+        run(picker.select(rng.choice(picker.options[1:] or ["All"])))
+    else:
+        run(widget(app.text_input, key="chat_input").input(query))
+
+def chat_outcome(app, operation, query):
+    # The app answers a submitted input once and keeps the parsed plan of that turn in session state
+    turn = app.session_state['chat_turn']
+    if turn is None or turn['input'] != query:
+        return operation, [f"chat input {query!r} was not answered"]
+    reply = app.session_state['chat_history'].recent(1)[0]['message']
+    label = turn['query_info']['operation'] if turn['query_info'] else operation
+    return label, [reply] if reply.startswith(FALLBACK_REPLY_PREFIX) else []
+
+def run_session(session_id, iterations, seed, max_employee_id, samples, errors, lock, app_lock):
+    rng = random.Random(seed + session_id)
+    operations = [(name, query) for name, _, query in OPERATION_MIX]
+    weights = [weight for _, weight, _ in OPERATION_MIX]
+    app = AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT_SECONDS)
+    plan = [('page_load', None)]
+    last_query = None
+    while len(plan) <= iterations:
+        operation, query = rng.choices(operations, weights=weights)[0]
+        # Resubmitting the text already in the chat box is not a new question, so the app would not answer it again
+        if query is not None and query == last_query:
+            continue
+        last_query = query or last_query
+        plan.append((operation, query))
+    service_seconds = [0.0]
+
+    def run(target):
+        with app_lock:
+            run_started = time.perf_counter()
+            try:
+                target.run()
+            finally:
+                service_seconds[0] += time.perf_counter() - run_started
+
+    for operation, query in plan:
+        service_seconds[0] = 0.0
+        started = time.perf_counter()
+        label = operation
+        try:
+            perform(app, operation, query, rng, max_employee_id, run)
+            failed = [str(e.value) for e in app.exception]
+            if query is not None and not failed:
+                label, failed = chat_outcome(app, operation, query)
+        except Exception as e:
+            failed = [f"{type(e).__name__}: {e}"]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append({'session': session_id, 'operation': label, 'latency_ms': elapsed_ms, 'service_ms': service_seconds[0] * 1000,
+                            'rss_bytes': current_rss_bytes(), 'failed': bool(failed)})
+            if failed:
+                errors.append((session_id, label, query, failed[0]))
+
+def summarize(samples):
+    frame = pd.DataFrame(samples)
+    latency = frame.groupby('operation')['latency_ms']
+    summary = pd.DataFrame({
+        'count': latency.size(),
+        'errors': frame.groupby('operation')['failed'].sum().astype(int),
+        'p50_ms': latency.quantile(0.50),
+        'p95_ms': latency.quantile(0.95),
+        'p99_ms': latency.quantile(0.99),
+        'service_p50_ms': frame.groupby('operation')['service_ms'].quantile(0.50),
+        'rss_mean_mb': frame.groupby('operation')['rss_bytes'].mean() / 1e6,
+        'rss_max_mb': frame.groupby('operation')['rss_bytes'].max() / 1e6
+    })
+    overall = frame['latency_ms']
+    summary.loc['ALL'] = [len(frame), int(frame['failed'].sum()), overall.quantile(0.50), overall.quantile(0.95),
+                          overall.quantile(0.99), frame['service_ms'].quantile(0.50), frame['rss_bytes'].mean() / 1e6, frame['rss_bytes'].max() / 1e6]
+    return summary.round(1)
+
+def summarize_sweep(rounds, baseline_bytes):
+    # One row per session count: if per-session state stays small, rss_max_mb stays roughly flat as sessions grow
+    rows = []
+    for sessions, samples, wall_seconds in rounds:
+        frame = pd.DataFrame(samples)
+        rows.append({
+            'sessions': sessions,
+            'ops': len(frame),
+            'errors': int(frame['failed'].sum()),
+            'ops_per_s': len(frame) / wall_seconds,
+            'p50_ms': frame['latency_ms'].quantile(0.50),
+            'p95_ms': frame['latency_ms'].quantile(0.95),
+            'rss_mean_mb': frame['rss_bytes'].mean() / 1e6,
+            'rss_max_mb': frame['rss_bytes'].max() / 1e6,
+            'rss_per_session_mb': (frame['rss_bytes'].max() - baseline_bytes) / 1e6 / sessions
+        })
+    return pd.DataFrame(rows).set_index('sessions').round(1)
+
+def run_round(sessions, iterations, seed, max_employee_id):
+    samples, errors, lock, app_lock = [], [], threading.Lock(), threading.Lock()
+    threads = [threading.Thread(target=run_session, args=(i, iterations, seed, max_employee_id, samples, errors, lock, app_lock))
+               for i in range(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for sample in samples:
+        sample['sessions'] = sessions
+    return samples, errors, time.perf_counter() - started
+
+def session_counts(text):
+    counts = [int(count) for count in text.split(',')]
+    if not counts or min(counts) < 1:
+        raise argparse.ArgumentTypeError("session counts must be positive integers")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for final_two.py")
+    parser.add_argument('--sessions', type=session_counts, default=[4],
+                        help="simultaneous simulated users; a comma list such as 1,2,4,8 runs one round per count")
+    parser.add_argument('--iterations', type=int, default=20, help="operations per session after the first page load")
+    parser.add_argument('--rows', type=int, default=5000, help="rows in the synthetic employee CSV")
+    parser.add_argument('--csv', help="serve this CSV instead of generating one")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="also write the raw samples to this CSV")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="employee_load_test_")
+    csv_path = args.csv or os.path.join(workdir, "employees.csv")
+    if not args.csv:
+        generate_employee_csv(csv_path, args.rows, args.seed)
+    max_employee_id = int(pd.read_csv(csv_path, usecols=['Employee_ID'])['Employee_ID'].max())
+    server = serve_directory(os.path.dirname(os.path.abspath(csv_path)))
+    os.environ['EMPLOYEE_DATA_SOURCES'] = f"LoadTest=http://127.0.0.1:{server.server_address[1]}/{os.path.basename(csv_path)}"
+    os.environ['EMPLOYEE_SNAPSHOT_DIR'] = os.path.join(workdir, "snapshots")
+
+    # Rounds run in one process like sessions on one server: the shared dataset and caches persist between them,
+    # and each round's sessions are released before the next one starts. A warm-up page load first imports the
+    # app's modules and loads the dataset, so the baseline holds everything that is shared rather than per session
+    AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT_SECONDS).run()
+    baseline_bytes = current_rss_bytes()
+    rounds, all_samples, all_errors = [], [], []
+    for sessions in args.sessions:
+        samples, errors, wall_seconds = run_round(sessions, args.iterations, args.seed, max_employee_id)
+        rounds.append((sessions, samples, wall_seconds))
+        all_samples.extend(samples)
+        all_errors.extend(errors)
+        print(f"{sessions} sessions x {args.iterations} operations against {csv_path} in {wall_seconds:.1f} s "
+              f"({len(samples) / wall_seconds:.1f} ops/s)")
+        print(summarize(samples).to_string())
+        for session_id, operation, query, message in errors[:10]:
+            print(f"session {session_id} {operation} {query!r}: {message[:200]}")
+    server.shutdown()
+
+    if len(rounds) > 1:
+        print(f"\nRSS against session count (process RSS after the warm-up page load: {baseline_bytes / 1e6:.1f} MB)")
+        print(summarize_sweep(rounds, baseline_bytes).to_string())
+    if args.output:
+        pd.DataFrame(all_samples).to_csv(args.output, index=False)
+    return 1 if all_errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# Compound filter predicates for the Employee Insights Dashboard chatbot, kept out of final_two.py so the parser
+# can be tested without starting the Streamlit app.
+import re
+
+import numpy as np
+import pandas as pd
+
+# parse_query in final_two.py turns the filter part of a question into an AST of
+# ('and', [nodes]), ('or', [nodes]), ('not', node) and ('cmp', column, op, value) leaves, which
+# process_query compiles into one boolean mask and applies to the frame in a single take.
+NUMERIC_CONDITION_KEYWORDS = [
+    ('performance score', 'Performance_Score'), ('performance', 'Performance_Score'),
+    ('satisfaction score', 'Employee_Satisfaction_Score'), ('satisfaction', 'Employee_Satisfaction_Score'),
+    ('productivity score', 'Productivity score'), ('productivity', 'Productivity score'),
+    ('retention risk index', 'Retension risk index'), ('retention risk', 'Retension risk index'), ('retention', 'Retension risk index'),
+    ('annual salary', 'Annual Salary'), ('salary', 'Annual Salary'), ('pay', 'Annual Salary'),
+    ('age', 'Age'), ('overtime hours', 'Overtime_Hours'), ('overtime', 'Overtime_Hours'), ('working hours', 'Overtime_Hours'),
+    ('number of projects', 'Number_of_Projects'), ('projects', 'Number_of_Projects'),
+    ('years at company', 'Years_At_Company'), ('tenure', 'Years_At_Company')
+]
+COMPARISON_WORDS = {
+    '>': '>', '<': '<', '>=': '>=', '<=': '<=', '=': '==', '==': '==',
+    'over': '>', 'above': '>', 'more than': '>', 'greater than': '>',
+    'under': '<', 'below': '<', 'less than': '<', 'at least': '>=', 'at most': '<=', 'between': 'between'
+}
+NEGATION_PATTERN = r'\b(?:not|without|excluding|except)\b'
+DEPARTMENT_ACRONYM_LENGTH = 3
+
+def parse_clause_conditions(clause, vocabulary, department_context=False):
+    leaves = []
+    numeric_pattern = '|'.join(re.escape(word) for word, _ in NUMERIC_CONDITION_KEYWORDS)
+    comparison_pattern = '|'.join(sorted((re.escape(word) for word in COMPARISON_WORDS), key=len, reverse=True))
+    for match in re.finditer(rf'\b({numeric_pattern})\s*(?:is\s+)?({comparison_pattern})\s*\$?([\d,]+(?:\.\d+)?)(?:\s+__and__\s+\$?([\d,]+(?:\.\d+)?))?', clause):
+        col = dict(NUMERIC_CONDITION_KEYWORDS)[match.group(1)]
+        op = COMPARISON_WORDS[match.group(2)]
+        low = float(match.group(3).replace(',', ''))
+        if op == 'between' and match.group(4):
+            leaves.append(('cmp', col, 'between', (low, float(match.group(4).replace(',', '')))))
+        elif op != 'between':
+            leaves.append(('cmp', col, op, low))
+    for match in re.finditer(r'\b(age|performance score)\s+(\d+)\b', clause):
+        leaves.append(('cmp', 'Age' if match.group(1) == 'age' else 'Performance_Score', '==', int(match.group(2))))
+    departments = vocabulary('Department')
+    if departments:
+        for value in departments:
+            pattern = re.escape(value.lower())
+            if value.isupper() and len(value) <= DEPARTMENT_ACRONYM_LENGTH and not department_context:
+                # Acronyms such as IT collide with ordinary words ("is it worth it"), so they need a department context
+                # word, or a sibling clause that already names a department ("in sales or hr")
+                pattern = rf'(?:\b(?:in|from|across)\s+(?:the\s+)?{pattern}\b|\b{pattern}\s+(?:department|dept|team)\b|\b(?:department|dept)\s+{pattern}\b)'
+            if re.search(rf'\b{pattern}\b', clause):
+                leaves.append(('cmp', 'Department', '==', value))
+                break
+    else:
+        for match in re.finditer(r'(?:in|across|for|of)\s+([\w&]+(?:\s+[\w&]+)?)\s+(?:department|dept)\b', clause):
+            leaves.append(('cmp', 'Department', '==', match.group(1).strip().title()))
+    for match in re.finditer(r'gender\s+(\w+)', clause):
+        leaves.append(('cmp', 'Gender', '==', match.group(1).title()))
+    job_match = re.search(r'job\s+title\s+([\w\s]+)', clause)
+    if job_match:
+        job_titles = [value for value in vocabulary('Job_Title') if job_match.group(1).startswith(value.lower())]
+        leaves.append(('cmp', 'Job_Title', '==', job_titles[0] if job_titles else job_match.group(1).split()[0].title()))
+    for match in re.finditer(r'\b(analyst)s?\b', clause):
+        leaves.append(('cmp', 'Job_Title', 'contains', match.group(1).title()))
+    for match in re.finditer(r'hired\s+(after|before)\s+(\d{4})\b', clause):
+        leaves.append(('cmp', 'Hire_Date', '>' if match.group(1) == 'after' else '<', pd.to_datetime(f"{match.group(2)}-01-01")))
+    for match in re.finditer(r'hired\s+between\s+(\d{4}-\d{2}-\d{2})\s+__and__\s+(\d{4}-\d{2}-\d{2})', clause):
+        leaves.append(('cmp', 'Hire_Date', 'between', (pd.to_datetime(match.group(1)), pd.to_datetime(match.group(2)))))
+    for match in re.finditer(r'(high|medium|low)\s+(performance\s+level|satisfaction\s+level|retention\s+risk\s+level)', clause):
+        leaves.append(('cmp', match.group(2).replace(' ', '_').title(), '==', match.group(1).title()))
+    # Drop exact duplicates (e.g. "analysts ... analyst") while keeping order
+    return list(dict.fromkeys(leaves))
+
+def combine_predicates(kind, nodes):
+    nodes = [child for node in nodes if node is not None for child in (node[1] if node[0] == kind else [node])]
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else (kind, nodes)
+
+def parse_predicate(query, vocabulary, department_context=False):
+    # vocabulary(column) returns the known values of a categorical column, longest first
+    # "between X and Y" keeps its "and" so it isn't mistaken for a conjunction
+    query = re.sub(r'\bbetween\s+(\S+)\s+and\s+(\S+)', r'between \1 __and__ \2', query)
+    disjuncts = []
+    for disjunct in re.split(r'\s+or\s+', query):
+        conjuncts = []
+        for clause in re.split(r'\s+and\s+|,\s+', disjunct):
+            # Only the conditions after the negation word are negated: "analysts not in sales"
+            negation = re.search(NEGATION_PATTERN, clause)
+            split = negation.start() if negation else len(clause)
+            conjuncts.append(combine_predicates('and', parse_clause_conditions(clause[:split], vocabulary, department_context)))
+            negated = combine_predicates('and', parse_clause_conditions(clause[split:], vocabulary, department_context))
+            if negated is not None:
+                conjuncts.append(('not', negated))
+        disjuncts.append(combine_predicates('and', conjuncts))
+    predicate = combine_predicates('or', disjuncts)
+    if not department_context and any(col == 'Department' for col, _, _ in predicate_leaves(predicate)):
+        # A department named in one clause lets bare acronyms in the sibling clauses count as departments too
+        return parse_predicate(query, vocabulary, department_context=True)
+    return predicate
+
+def predicate_leaves(node):
+    if node is None:
+        return []
+    if node[0] == 'cmp':
+        return [node[1:]]
+    if node[0] == 'not':
+        return predicate_leaves(node[1])
+    return [leaf for child in node[1] for leaf in predicate_leaves(child)]
+
+def compile_predicate(node, df, columns=None):
+    # Each column is pulled out of the frame once; leaves are vectorized comparisons combined with NumPy
+    columns = {} if columns is None else columns
+    kind = node[0]
+    if kind == 'and':
+        mask = np.ones(len(df), dtype=bool)
+        for child in node[1]:
+            mask &= compile_predicate(child, df, columns)
+        return mask
+    if kind == 'or':
+        mask = np.zeros(len(df), dtype=bool)
+        for child in node[1]:
+            mask |= compile_predicate(child, df, columns)
+        return mask
+    if kind == 'not':
+        return ~compile_predicate(node[1], df, columns)
+    _, col, op, val = node
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    if col not in columns:
+        columns[col] = df[col]
+    series = columns[col]
+    if op == '==':
+        result = series == val
+    elif op == '>':
+        result = series > val
+    elif op == '<':
+        result = series < val
+    elif op == '>=':
+        result = series >= val
+    elif op == '<=':
+        result = series <= val
+    elif op == 'between':
+        low, high = val
+        result = (series >= low) & (series <= high)
+    elif op == 'contains':
+        result = series.astype(str).str.contains(val, case=False, na=False) if series.dtype == 'category' else series.str.contains(val, case=False, na=False)
+    else:
+        return np.ones(len(df), dtype=bool)
+    return result.to_numpy(dtype=bool, na_value=False)
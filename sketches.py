@@ -0,0 +1,181 @@
+# Aggregate sketches for the Employee Insights Dashboard chatbot, kept out of final_two.py so they can be
+# imported and checked against exact pandas results without starting the Streamlit app.
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Mergeable sketches back the percentile and approximate-distinct chatbot aggregates: a KLL sketch for quantiles
+# and a HyperLogLog for distinct counts. One set is kept per (Department, Job_Title, Remote_Work_Category) cell
+# and per data version, so any sidebar selection or group-by is answered by merging cells. On a new version,
+# cells whose rows are unchanged reuse the previous version's sketches.
+SKETCH_GROUP_COLUMNS = ['Department', 'Job_Title', 'Remote_Work_Category']
+SKETCH_QUANTILE_COLUMNS = ['Annual Salary', 'Age', 'Performance_Score', 'Employee_Satisfaction_Score', 'Productivity score',
+                           'Retension risk index', 'Overtime_Hours', 'Number_of_Projects']
+SKETCH_DISTINCT_COLUMNS = ['Employee_ID', 'Department', 'Job_Title', 'Gender', 'Remote_Work_Category']
+KLL_K = 200
+HLL_PRECISION = 12
+
+class KLLSketch:
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _capacity(self, level):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - level))))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Odd leftovers stay at this level; the rest is halved and promoted with double weight
+                keep = items[:1] if len(items) % 2 else items[:0]
+                paired = items[len(keep):]
+                promoted = paired[np.random.randint(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(values[order][min(position, len(values) - 1)])
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return self
+        hashes = pd.util.hash_array(values.astype(str).to_numpy())
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        np.maximum.at(self.registers, buckets, self._leading_zeros(remainder) + 1)
+        return self
+
+    @staticmethod
+    def _leading_zeros(words):
+        words = words.copy()
+        zeros = np.zeros(len(words), dtype=np.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            mask = words < np.uint64(1 << (64 - shift))
+            zeros[mask] += shift
+            words[mask] <<= np.uint64(shift)
+        return zeros
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        empty = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and empty:
+            return m * np.log(m / empty)
+        return raw
+
+def new_sketch(agg_func):
+    return HyperLogLog() if agg_func == 'approx_distinct' else KLLSketch()
+
+def build_sketch(agg_func, values):
+    sketch = new_sketch(agg_func)
+    return sketch.update(values if agg_func == 'approx_distinct' else pd.to_numeric(values, errors='coerce'))
+
+class SketchIndex:
+    def __init__(self, df, previous=None):
+        self.group_columns = [col for col in SKETCH_GROUP_COLUMNS if col in df.columns]
+        self.cells = {}
+        if df.empty or not self.group_columns:
+            return
+        content = df.drop(columns=['Years_At_Company'], errors='ignore')
+        row_hashes = pd.util.hash_pandas_object(content, index=False).to_numpy()
+        reused = 0
+        for cell, positions in df.groupby(self.group_columns, observed=True, dropna=False).indices.items():
+            cell = cell if isinstance(cell, tuple) else (cell,)
+            fingerprint = (int(np.bitwise_xor.reduce(row_hashes[positions])), len(positions))
+            if previous is not None and previous.cells.get(cell, (None,))[0] == fingerprint:
+                self.cells[cell] = previous.cells[cell]
+                reused += 1
+                continue
+            rows = df.iloc[positions]
+            quantiles = {col: build_sketch('quantile', rows[col]) for col in SKETCH_QUANTILE_COLUMNS if col in df.columns}
+            distincts = {col: build_sketch('approx_distinct', rows[col]) for col in SKETCH_DISTINCT_COLUMNS if col in df.columns}
+            self.cells[cell] = (fingerprint, quantiles, distincts)
+        logger.info(f"Built sketch index with {len(self.cells)} cells ({reused} reused from the previous version).")
+
+    def supports(self, column, agg_func, group_by=None):
+        columns = SKETCH_DISTINCT_COLUMNS if agg_func == 'approx_distinct' else SKETCH_QUANTILE_COLUMNS
+        return column in columns and (group_by is None or group_by in self.group_columns)
+
+    def merge(self, column, agg_func, cell_filter, group_by=None):
+        # cell_filter maps group columns to the selected value; unselected columns match every cell
+        part = 2 if agg_func == 'approx_distinct' else 1
+        merged = {}
+        for cell, sketches in self.cells.items():
+            values = dict(zip(self.group_columns, cell))
+            if any(values[col] != value for col, value in cell_filter.items()):
+                continue
+            sketch = sketches[part].get(column)
+            if sketch is None:
+                continue
+            key = values[group_by] if group_by else None
+            if key not in merged:
+                merged[key] = new_sketch(agg_func)
+            merged[key].merge(sketch)
+        return merged
+
+def sketch_aggregate(filtered_df, query_info, sketches=None):
+    agg_func = query_info['agg_func']
+    agg_col = query_info.get('agg_column')
+    group_col = query_info.get('group_by')
+    if not agg_col or agg_col not in filtered_df.columns:
+        return pd.DataFrame({"Error": ["No valid column for aggregation"]})
+    if sketches is not None and not query_info['conditions'] and sketches[0].supports(agg_col, agg_func, group_col):
+        index, cell_filter = sketches
+        merged = index.merge(agg_col, agg_func, cell_filter, group_col)
+    else:
+        # Conditions or columns outside the index: sketch the filtered rows directly, one pass per group
+        groups = filtered_df.groupby(group_col, observed=True).indices if group_col else {None: np.arange(len(filtered_df))}
+        merged = {key: build_sketch(agg_func, filtered_df[agg_col].iloc[positions]) for key, positions in groups.items()}
+    label = f"{agg_func}({agg_col})"
+    if agg_func == 'approx_distinct':
+        values = {key: int(round(sketch.estimate())) for key, sketch in merged.items()}
+    else:
+        values = {key: sketch.quantile(query_info['quantile']) for key, sketch in merged.items()}
+    if group_col:
+        return pd.DataFrame({group_col: list(values), label: list(values.values())})
+    return pd.DataFrame({label: [values.get(None, float('nan'))]})
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import APP_PATH, generate_employee_csv, serve_directory
+
+ROWS = 500
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("app")
+    generate_employee_csv(workdir / "employees.csv", ROWS)
+    server = serve_directory(str(workdir))
+    environ = dict(os.environ)
+    os.environ['EMPLOYEE_DATA_SOURCES'] = f"Tests=http://127.0.0.1:{server.server_address[1]}/employees.csv"
+    os.environ['EMPLOYEE_SNAPSHOT_DIR'] = str(workdir / "snapshots")
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.run()
+    yield app
+    server.shutdown()
+    os.environ.clear()
+    os.environ.update(environ)
@@ -0,0 +1,60 @@
+import ast
+
+import pytest
+
+from conftest import ROWS
+from load_test import APP_PATH
+
+# Operation each data template must parse to; the rest are answered by intents, the employee lookup or the trend path
+EXPECTED_OPERATIONS = {
+    "Employee ID with salary > 90000": 'filter',
+    "Average salary for analyst": 'aggregate',
+    "Average salary by department": 'group_aggregate',
+    "Median salary by department": 'group_aggregate',
+    "90th percentile salary by department": 'group_aggregate',
+    "Number of distinct job titles by department": 'group_aggregate',
+    "How many employees in each department": 'group_aggregate',
+    "Number of employees by remote work": 'group_aggregate',
+    "List departments": 'list_unique',
+    "List job titles": 'list_unique',
+    "Top 5 employees by salary": 'sort',
+    "Top 5 employees by performance score": 'sort',
+    "Top 3 employees by salary in each department": 'group_top',
+    "How many females": 'count_value',
+    "How many employees with low satisfaction level": 'count_value',
+    "Show employees with low satisfaction level": 'filter',
+    "Show employees with high retention risk level": 'filter',
+    "Salary distribution": 'filter'
+}
+REPLY_ONLY = {"Employee 123", "Salary trend this year", "Employee count trend this quarter",
+              "Help", "Hello", "What's the time?", "Tell me a joke"}
+
+def chat_query_templates():
+    tree = ast.parse(open(APP_PATH).read())
+    node = next(node for node in tree.body if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == 'CHAT_QUERY_TEMPLATES')
+    return ast.literal_eval(node.value)
+
+TEMPLATES = chat_query_templates()
+
+def test_every_template_has_an_expectation():
+    assert set(TEMPLATES) == set(EXPECTED_OPERATIONS) | REPLY_ONLY
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_template_answers(app, template):
+    context = app.session_state['conversation_context']
+    previous_result_id = context.last_result_id
+    app.text_input(key="chat_input").input(template).run()
+    assert not app.exception, [e.value for e in app.exception]
+    reply = app.session_state['chat_history'].recent(1)[0]
+    assert reply['role'] == 'bot' and not reply['message'].startswith("Sorry"), reply
+    if template == "Employee 123":
+        assert reply['message'].startswith("Employee ID: 123"), reply
+    if template in REPLY_ONLY:
+        return
+    query_info = context.last_query_info
+    assert context.last_result_id != previous_result_id
+    assert query_info['operation'] == EXPECTED_OPERATIONS[template]
+    result_df = app.session_state['result_store'].get(context.last_result_id)
+    assert not result_df.empty and 'Error' not in result_df.columns
+    if query_info.get('predicate') is not None and query_info['operation'] == 'filter':
+        assert len(result_df) < ROWS
@@ -0,0 +1,65 @@
+from conftest import ROWS
+
+def submit(app, text):
+    app.text_input(key="chat_input").input(text).run()
+    assert not app.exception, [e.value for e in app.exception]
+
+def test_page_flip_renders_the_stored_result(app):
+    submit(app, "Show employees with low satisfaction level")
+    history_length = len(app.session_state['chat_history'])
+    result_id = app.session_state['conversation_context'].last_result_id
+    total = len(app.session_state['result_store'].get(result_id))
+    assert total > 100
+
+    app.number_input(key="chat_result_page").set_value(2).run()
+    assert not app.exception
+    assert len(app.session_state['chat_history']) == history_length
+    assert app.session_state['conversation_context'].last_result_id == result_id
+    assert f"Rows 101-{min(200, total)} of {total}" in [caption.value for caption in app.caption]
+
+def test_declining_a_chart_is_recorded_once(app):
+    submit(app, "List departments")
+    history_length = len(app.session_state['chat_history'])
+    app.radio(key="vis_choice_List departments").set_value("No").run()
+    app.run()
+    assert len(app.session_state['chat_history']) == history_length + 1
+
+def test_new_input_is_answered_and_resets_the_page(app):
+    submit(app, "Show employees with high retention risk level")
+    history = app.session_state['chat_history'].recent(2)
+    assert [message['role'] for message in history] == ['user', 'bot']
+    assert app.session_state['chat_result_page'] == 1
+
+def test_context_observes_each_submitted_input_once(app):
+    submit(app, "Show employees with low satisfaction level")
+    context = app.session_state['conversation_context']
+    turns, keywords = list(context.turns), dict(context.keywords)
+
+    app.number_input(key="chat_result_page").set_value(2).run()
+    app.selectbox(key="selected_employee").select(app.selectbox(key="selected_employee").options[0]).run()
+    app.run()
+    assert list(context.turns) == turns and dict(context.keywords) == keywords
+
+    submit(app, "List departments")
+    assert len(context.turns) == min(len(turns) + 1, context.turns.maxlen)
+    assert 'departments' in context.turns[-1][0]
+
+def test_employee_follow_up_finds_the_employee(app):
+    submit(app, "Employee 42")
+    assert app.session_state['chat_history'].recent(1)[0]['message'].startswith("Employee ID: 42")
+    submit(app, "List departments")
+    submit(app, "Tell me more about employee 42")
+    assert app.session_state['chat_history'].recent(1)[0]['message'].startswith("Following up on Employee 42")
+
+def test_sidebar_change_answers_again(app):
+    submit(app, "How many employees")
+    before = app.session_state['chat_history'].recent(1)[0]['message']
+    assert before.endswith(f"count of employees: {ROWS}")
+
+    department = next(w for w in app.selectbox if w.label == "Select Department")
+    department.select("HR").run()
+    after = app.session_state['chat_history'].recent(1)[0]['message']
+    result = app.session_state['result_store'].get(app.session_state['conversation_context'].last_result_id)
+    assert after.endswith(f"count of employees: {result.iloc[0, 0]}") and 0 < result.iloc[0, 0] < ROWS
+
+    next(w for w in app.selectbox if w.label == "Select Department").select("All").run()
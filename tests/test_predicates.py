@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from predicates import compile_predicate, parse_predicate
+
+VOCABULARY = {
+    'Department': ['Engineering', 'Finance', 'Sales', 'HR', 'IT'],
+    'Job_Title': ['Specialist', 'Consultant', 'Engineer', 'Analyst', 'Manager']
+}
+
+def vocabulary(column):
+    return VOCABULARY.get(column, [])
+
+def parse(query):
+    return parse_predicate(query, vocabulary)
+
+@pytest.fixture
+def employees():
+    rng = np.random.default_rng(0)
+    rows = 1000
+    return pd.DataFrame({
+        'Department': rng.choice(VOCABULARY['Department'], rows),
+        'Job_Title': rng.choice(VOCABULARY['Job_Title'], rows),
+        'Annual Salary': rng.uniform(40000, 150000, rows).round(),
+        'Age': rng.integers(21, 60, rows),
+        'Retention_Risk_Level': rng.choice(['Low', 'Medium', 'High'], rows)
+    })
+
+def test_or_list_of_departments_keeps_every_department():
+    assert parse("employees in sales or hr") == ('or', [('cmp', 'Department', '==', 'Sales'), ('cmp', 'Department', '==', 'HR')])
+    assert parse("employees in it or hr") == ('or', [('cmp', 'Department', '==', 'IT'), ('cmp', 'Department', '==', 'HR')])
+
+def test_or_list_of_departments_selects_their_rows(employees):
+    mask = compile_predicate(parse("employees in sales or hr"), employees)
+    assert mask.sum() == employees['Department'].isin(['Sales', 'HR']).sum()
+
+def test_acronym_department_needs_context():
+    assert parse("is it worth it") is None
+    assert parse("hr") is None
+    assert parse("employees in it") == ('cmp', 'Department', '==', 'IT')
+    assert parse("it department salary > 90000") == ('and', [('cmp', 'Annual Salary', '>', 90000.0), ('cmp', 'Department', '==', 'IT')])
+
+def test_negation_applies_to_the_conditions_after_it(employees):
+    assert parse("analysts not in sales") == ('and', [('cmp', 'Job_Title', 'contains', 'Analyst'), ('not', ('cmp', 'Department', '==', 'Sales'))])
+    mask = compile_predicate(parse("analysts not in sales"), employees)
+    expected = (employees['Job_Title'] == 'Analyst') & (employees['Department'] != 'Sales')
+    assert mask.sum() == expected.sum() > 0
+
+def test_negation_after_a_comparison(employees):
+    mask = compile_predicate(parse("salary > 90000 not in sales"), employees)
+    expected = (employees['Annual Salary'] > 90000) & (employees['Department'] != 'Sales')
+    assert (mask == expected.to_numpy()).all()
+
+def test_without_negates_a_level():
+    assert parse("analysts without high retention risk level") == (
+        'and', [('cmp', 'Job_Title', 'contains', 'Analyst'), ('not', ('cmp', 'Retention_Risk_Level', '==', 'High'))])
+
+def test_between_keeps_its_and(employees):
+    predicate = parse("age between 30 and 40 and salary > 90000")
+    assert predicate == ('and', [('cmp', 'Age', 'between', (30.0, 40.0)), ('cmp', 'Annual Salary', '>', 90000.0)])
+    mask = compile_predicate(predicate, employees)
+    expected = employees['Age'].between(30, 40) & (employees['Annual Salary'] > 90000)
+    assert (mask == expected.to_numpy()).all()
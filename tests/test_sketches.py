@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, KLLSketch, SketchIndex, sketch_aggregate
+
+QUANTILES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+KLL_MAX_RANK_ERROR = 0.02
+HLL_MAX_RELATIVE_ERROR = 0.05
+
+@pytest.fixture(autouse=True)
+def seeded():
+    np.random.seed(0)
+
+def rank_error(values, estimate, q):
+    # Distance from q to the range of ranks the estimate covers, so ties in discrete columns are not penalized
+    values = np.sort(values)
+    low = np.searchsorted(values, estimate, side='left') / len(values)
+    high = np.searchsorted(values, estimate, side='right') / len(values)
+    return max(low - q, q - high, 0)
+
+def employee_frame(rows=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Employee_ID': np.arange(1, rows + 1),
+        'Department': rng.choice(['Sales', 'IT', 'HR', 'Engineering'], rows),
+        'Job_Title': rng.choice(['Analyst', 'Engineer', 'Manager'], rows),
+        'Remote_Work_Category': rng.choice(['Office', 'Hybrid', 'Remote'], rows),
+        'Gender': rng.choice(['Male', 'Female'], rows),
+        'Annual Salary': rng.lognormal(11, 0.4, rows).round(),
+        'Age': rng.integers(21, 60, rows)
+    })
+
+def query(agg_func, column, group_by=None, quantile=None, conditions=None):
+    return {'agg_func': agg_func, 'agg_column': column, 'group_by': group_by, 'quantile': quantile, 'conditions': conditions or []}
+
+@pytest.mark.parametrize('rows', [1000, 100000])
+def test_kll_rank_error(rows):
+    values = np.random.default_rng(rows).normal(70000, 15000, rows)
+    sketch = KLLSketch().update(values)
+    assert sketch.count == rows
+    for q in QUANTILES:
+        assert rank_error(values, sketch.quantile(q), q) <= KLL_MAX_RANK_ERROR
+
+def test_kll_merge_matches_single_sketch_accuracy():
+    rng = np.random.default_rng(2)
+    parts = [rng.exponential(1000, 30000), rng.uniform(0, 5000, 50000), rng.normal(2000, 100, 20000)]
+    merged = KLLSketch()
+    for part in parts:
+        merged.merge(KLLSketch().update(part))
+    values = np.concatenate(parts)
+    assert merged.count == len(values)
+    for q in QUANTILES:
+        assert rank_error(values, merged.quantile(q), q) <= KLL_MAX_RANK_ERROR
+
+def test_kll_ignores_nan_and_empty():
+    assert np.isnan(KLLSketch().quantile(0.5))
+    assert KLLSketch().update([1.0, np.nan, 3.0]).count == 2
+
+@pytest.mark.parametrize('cardinality', [100, 5000, 200000])
+def test_hll_relative_error(cardinality):
+    values = np.random.default_rng(cardinality).permutation(cardinality)
+    sketch = HyperLogLog().update(np.concatenate([values, values[:cardinality // 2]]))
+    assert abs(sketch.estimate() - cardinality) / cardinality <= HLL_MAX_RELATIVE_ERROR
+
+def test_hll_merge_counts_the_union():
+    left = HyperLogLog().update(np.arange(0, 60000))
+    right = HyperLogLog().update(np.arange(40000, 100000))
+    assert abs(left.merge(right).estimate() - 100000) / 100000 <= HLL_MAX_RELATIVE_ERROR
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_sketch_aggregate_quantile_matches_pandas(use_index):
+    df = employee_frame()
+    sketches = (SketchIndex(df), {}) if use_index else None
+    result = sketch_aggregate(df, query('quantile', 'Annual Salary', quantile=0.9), sketches)
+    assert list(result.columns) == ['quantile(Annual Salary)']
+    assert rank_error(df['Annual Salary'].to_numpy(), result.iloc[0, 0], 0.9) <= KLL_MAX_RANK_ERROR
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_sketch_aggregate_grouped_quantile_matches_pandas(use_index):
+    df = employee_frame()
+    sketches = (SketchIndex(df), {'Job_Title': 'Analyst'}) if use_index else None
+    filtered = df[df['Job_Title'] == 'Analyst']
+    result = sketch_aggregate(filtered, query('quantile', 'Age', group_by='Department', quantile=0.5), sketches).set_index('Department')
+    exact = filtered.groupby('Department')['Age']
+    assert set(result.index) == set(exact.groups)
+    for department, ages in exact:
+        assert rank_error(ages.to_numpy(), result.loc[department, 'quantile(Age)'], 0.5) <= KLL_MAX_RANK_ERROR
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_sketch_aggregate_approx_distinct_matches_pandas(use_index):
+    df = employee_frame()
+    sketches = (SketchIndex(df), {}) if use_index else None
+    result = sketch_aggregate(df, query('approx_distinct', 'Employee_ID', group_by='Department'), sketches).set_index('Department')
+    exact = df.groupby('Department')['Employee_ID'].nunique()
+    relative = (result['approx_distinct(Employee_ID)'] - exact).abs() / exact
+    assert relative.max() <= HLL_MAX_RELATIVE_ERROR
+
+def test_sketch_index_reuses_unchanged_cells():
+    df = employee_frame()
+    previous = SketchIndex(df)
+    changed = df.copy()
+    changed.loc[0, 'Annual Salary'] += 1
+    current = SketchIndex(changed, previous)
+    cell = tuple(changed.loc[0, ['Department', 'Job_Title', 'Remote_Work_Category']])
+    reused = [key for key in current.cells if current.cells[key] is previous.cells[key]]
+    assert cell not in reused and len(reused) == len(current.cells) - 1
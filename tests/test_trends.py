@@ -0,0 +1,39 @@
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from load_test import APP_PATH, generate_employee_csv, serve_directory
+
+def test_trend_follows_the_sidebar_selection(tmp_path, monkeypatch):
+    path = tmp_path / "employees.csv"
+    generate_employee_csv(path, 300)
+    employees = pd.read_csv(path)
+    hr = employees[employees['Department'] == 'HR']
+    server = serve_directory(str(tmp_path))
+    monkeypatch.setenv('EMPLOYEE_DATA_SOURCES', f"Tests=http://127.0.0.1:{server.server_address[1]}/employees.csv")
+    monkeypatch.setenv('EMPLOYEE_SNAPSHOT_DIR', str(tmp_path / "snapshots"))
+    try:
+        # The tenant registry is process-global; clearing it makes each app load like a fresh server process
+        st.cache_resource.clear()
+        AppTest.from_file(APP_PATH, default_timeout=120).run()
+        # The next app starts from the local snapshot and its background refresh records the source's
+        # new version, which has ten fewer HR employees
+        employees.drop(hr.index[:10]).to_csv(path, index=False)
+        st.cache_resource.clear()
+        app = AppTest.from_file(APP_PATH, default_timeout=120)
+        app.run()
+        next(w for w in app.selectbox if w.label == "Select Department").select("HR").run()
+        deadline = time.time() + 30
+        while True:
+            app.text_input(key="chat_input").input("Employee count trend this year").run()
+            assert not app.exception, [e.value for e in app.exception]
+            message = app.session_state['chat_history'].recent(1)[0]['message']
+            if "snapshots" in message or time.time() > deadline:
+                break
+            app.text_input(key="chat_input").input("").run()
+            time.sleep(0.5)
+        assert message == f"count(employees) moved from {len(hr)}.00 to {len(hr) - 10}.00 across 2 snapshots."
+    finally:
+        server.shutdown()